@@ -0,0 +1,59 @@
+"""
+Benchmark: extractive quiz generation for short articles
+Times the no-LLM path (segmentation, term extraction, cloze distractors and
+quality checks) on a stub-sized article and checks the result is a valid
+stored quiz payload.
+
+Run from the backend directory:
+    python benchmarks/bench_extractive_quiz.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from extractive_quiz import build_checked_quiz  # noqa: E402
+from serialization import serialize_quiz_payload  # noqa: E402
+from wiki_lang import count_words  # noqa: E402
+
+ITERATIONS = 200
+
+ARTICLE_TITLE = "Python (programming language)"
+ARTICLE = (
+    "Python is a high-level, general-purpose programming language. Its design philosophy "
+    "emphasizes code readability with the use of significant indentation. Guido van Rossum "
+    "began working on Python in the late 1980s as a successor to the ABC programming language "
+    "and first released it in 1991 as Python 0.9.0. Python 2.0 was released in 2000. "
+    "Python 3.0, released in 2008, was a major revision not completely backward-compatible "
+    "with earlier versions. Python 2.7.18, released in 2020, was the last release of Python 2. "
+    "Python was conceived in the late 1980s by Guido van Rossum at Centrum Wiskunde & "
+    "Informatica in the Netherlands. Van Rossum shouldered sole responsibility for the project, "
+    "as the lead developer, until 12 July 2018, when he announced his permanent vacation from "
+    "his responsibilities as Python's Benevolent Dictator For Life. In January 2019, active "
+    "Python core developers elected a five-member Steering Council to lead the project. "
+    "The Python Software Foundation manages and directs resources for Python and CPython "
+    "development. Large organizations that use Python include Wikipedia, Google, Yahoo!, "
+    "CERN, NASA, Facebook, Amazon, Instagram and Spotify. Dr. Tim Peters wrote the Zen of "
+    "Python, which was published in 2004 as PEP 20. The standard library has more than 200 "
+    "modules covering a wide range of tasks. Microsoft began shipping Python with Windows in "
+    "2019 through the Microsoft Store. Python was the most popular language on GitHub in 2024, "
+    "overtaking JavaScript. The language is named after the British comedy group Monty Python."
+)
+
+
+def main():
+    quiz, problems = build_checked_quiz(ARTICLE, ARTICLE_TITLE)
+    assert quiz is not None, f"Quality checks failed: {problems}"
+    serialize_quiz_payload(quiz)  # Raises if the payload isn't valid
+
+    seconds = min(timeit.repeat(lambda: build_checked_quiz(ARTICLE, ARTICLE_TITLE),
+                                number=ITERATIONS, repeat=3))
+    print(f"Article: {count_words(ARTICLE, 'en')} words, {len(quiz['quiz'])} questions")
+    print(f"  extractive {seconds / ITERATIONS * 1000:8.2f} ms/quiz")
+
+
+if __name__ == "__main__":
+    main()
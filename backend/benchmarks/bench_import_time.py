@@ -0,0 +1,81 @@
+"""
+Benchmark: API cold-start import time
+Imports main in a fresh interpreter under `python -X importtime`, reports
+the slowest top-level imports and checks that the LLM and scraping stack
+is not imported at startup (it is loaded lazily on first use).
+
+Run from the backend directory:
+    python benchmarks/bench_import_time.py [--budget-ms 2000]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Must not be imported by `import main`
+LAZY_MODULES = [
+    "langchain_core",
+    "langchain_google_genai",
+    "google.generativeai",
+    "bs4",
+    "requests",
+]
+
+LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_imports(module: str = "main"):
+    """
+    Import a module in a fresh interpreter with -X importtime
+
+    Returns:
+        list: (module, self µs, cumulative µs, depth) per imported module
+    """
+    env = dict(os.environ, DATABASE_URL="sqlite://", PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fail if importing main takes longer than this")
+    parser.add_argument("--top", type=int, default=10, help="Number of top-level imports to list")
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    total_ms = next(cum for name, _, cum, depth in imports if name == "main" and depth == 0) / 1000
+
+    print(f"import main: {total_ms:.0f} ms")
+    # Direct imports of main are one level below it
+    top_level = sorted((i for i in imports if i[3] == 1), key=lambda i: i[2], reverse=True)
+    for name, _, cumulative_us, _ in top_level[:args.top]:
+        print(f"  {name:<32} {cumulative_us / 1000:8.1f} ms")
+
+    imported = {name for name, *_ in imports}
+    eager = [m for m in LAZY_MODULES if m in imported]
+    failed = False
+    if eager:
+        print(f"❌ Imported at startup (should be lazy): {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"❌ Over budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
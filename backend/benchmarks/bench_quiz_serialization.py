@@ -0,0 +1,91 @@
+"""
+Benchmark: quiz response serialization
+Compares the original read path (json.loads -> QuizResponse validation ->
+jsonable_encoder -> json.dumps) with the pre-serialized splice path.
+
+Run from the backend directory:
+    python benchmarks/bench_quiz_serialization.py
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from models import QuizResponse  # noqa: E402
+from serialization import serialize_quiz_payload, quiz_response_bytes  # noqa: E402
+
+ITERATIONS = 5000
+
+
+def sample_quiz_data(num_questions: int = 10) -> dict:
+    """Quiz shaped like a typical Gemini generation"""
+    return {
+        "title": "Python (programming language)",
+        "summary": "Python is a high-level, general-purpose programming language. " * 3,
+        "key_entities": {
+            "people": ["Guido van Rossum", "Tim Peters"],
+            "organizations": ["Python Software Foundation", "CWI"],
+            "locations": ["Netherlands", "United States"]
+        },
+        "sections": ["History", "Design philosophy", "Syntax and semantics", "Libraries"],
+        "quiz": [{
+            "question": f"Question {i}: which statement about Python's design is correct?",
+            "options": [f"Option {c} for question {i}" for c in "ABCD"],
+            "answer": f"Option A for question {i}",
+            "difficulty": ["easy", "medium", "hard"][i % 3],
+            "explanation": "Python emphasizes readability with significant indentation. " * 2,
+            "section": "Design philosophy"
+        } for i in range(num_questions)],
+        "related_topics": ["Perl", "Ruby", "CPython", "PyPy", "Jython"]
+    }
+
+
+def current_path(row) -> bytes:
+    quiz_data = json.loads(row.full_quiz_data)
+    model = QuizResponse(
+        id=row.id,
+        url=row.url,
+        lang=row.lang,
+        date_generated=row.date_generated,
+        is_cached=True,
+        **quiz_data
+    )
+    return json.dumps(jsonable_encoder(model), ensure_ascii=False).encode("utf-8")
+
+
+def fast_path(row) -> bytes:
+    return quiz_response_bytes(row, is_cached=True)
+
+
+def main():
+    quiz_data = sample_quiz_data()
+    row = SimpleNamespace(
+        id=42,
+        url="https://en.wikipedia.org/wiki/Python_(programming_language)",
+        lang="en",
+        date_generated=datetime(2025, 1, 1, 12, 30, 45, 123456),
+        full_quiz_data=serialize_quiz_payload(quiz_data)
+    )
+
+    assert json.loads(current_path(row)) == json.loads(fast_path(row)), "Outputs differ"
+
+    print(f"Payload: {len(fast_path(row))} bytes, {ITERATIONS} iterations")
+    results = {}
+    for name, fn in [("current", current_path), ("fast", fast_path)]:
+        seconds = min(timeit.repeat(lambda: fn(row), number=ITERATIONS, repeat=3))
+        results[name] = seconds
+        print(f"  {name:<8} {seconds / ITERATIONS * 1e6:8.2f} µs/response")
+
+    print(f"  speedup  {results['current'] / results['fast']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,10 @@ Database configuration and models
 Sets up SQLAlchemy connection and defines Quiz table schema
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from sqlalchemy import (
+    create_engine, event, inspect, Column, BigInteger, Integer, String, Text, DateTime, Index,
+    LargeBinary, Float
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -13,24 +16,129 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+
+def normalize_database_url(url: str) -> str:
+    """
+    Turn deployment-style database settings into SQLAlchemy URLs
+    - Bare file paths (as set on Render) become sqlite:/// URLs
+    - Heroku/Render style postgres:// becomes postgresql://
+    """
+    if "://" not in url:
+        return f"sqlite:///{url}"
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
 # Get database URL from environment or use SQLite as default
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./quiz_history.db")
-
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,  # Set to True for SQL query logging
-    pool_pre_ping=True,  # Verify connections before using
-    pool_recycle=3600  # Recycle connections after 1 hour
+DATABASE_URL = normalize_database_url(
+    os.getenv("DATABASE_URL", "sqlite:///./quiz_history.db")
 )
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite tuning profile (applied to every new connection)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "10"))
+
+# Server database (PostgreSQL) pool sizing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    """True for in-memory SQLite URLs, which cannot be shared between engines"""
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _apply_sqlite_pragmas(dbapi_connection, read_only: bool = False):
+    """
+    Apply the SQLite tuning profile to a fresh DBAPI connection
+    - WAL lets readers proceed while a writer holds the lock
+    - busy_timeout makes writers wait instead of failing with "database is locked"
+    - synchronous=NORMAL is durable under WAL and avoids an fsync per commit
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative cache_size is interpreted by SQLite as KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
 
-# Create session factory
+def _create_engines():
+    """
+    Create the (write, read) engine pair for the configured database
+    SQLite gets a separate read-only pool so readers never queue behind
+    the writer connection; other databases share a single pooled engine.
+    """
+    if not IS_SQLITE:
+        write_engine = create_engine(
+            DATABASE_URL,
+            echo=False,  # Set to True for SQL query logging
+            pool_pre_ping=True,  # Verify connections before using
+            pool_recycle=3600,  # Recycle connections after 1 hour
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT
+        )
+        return write_engine, write_engine
+
+    connect_args = {
+        "check_same_thread": False,  # Sessions are handed across FastAPI's threadpool
+        "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000
+    }
+
+    write_engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
+
+    @event.listens_for(write_engine, "connect")
+    def _on_write_connect(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection)
+
+    if _is_sqlite_memory(DATABASE_URL):
+        return write_engine, write_engine
+
+    read_engine = create_engine(
+        DATABASE_URL,
+        echo=False,
+        connect_args=connect_args,
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=0
+    )
+
+    @event.listens_for(read_engine, "connect")
+    def _on_read_connect(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, read_only=True)
+
+    return write_engine, read_engine
+
+
+# Create SQLAlchemy engines
+engine, read_engine = _create_engines()
+
+# Create session factories
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine
+)
+
 # Create base class for models
 Base = declarative_base()
 
@@ -44,22 +152,130 @@ class Quiz(Base):
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     url = Column(String(500), nullable=False, index=True)
+    lang = Column(String(16), nullable=False, default="en", server_default="en")  # Wikipedia language
     title = Column(String(300), nullable=False)
     date_generated = Column(DateTime, default=datetime.utcnow, nullable=False)
     scraped_content = Column(Text, nullable=True)  # Raw HTML for reference
     full_quiz_data = Column(Text, nullable=False)  # JSON string of quiz data
+    revision_id = Column(BigInteger, nullable=True)  # Wikipedia revision the quiz was built from
+    revision_size = Column(Integer, nullable=True)  # Article size (wikitext bytes) at that revision
+    superseded_by = Column(Integer, nullable=True, index=True)  # Newer quiz for the same article
+    variant = Column(String(64), nullable=True)  # Question count/difficulty key; NULL for the default quiz
+
+    # Caches are partitioned by language: lookups always filter on (lang, url)
+    __table_args__ = (
+        Index("ix_quizzes_lang_url", "lang", "url"),
+    )
     
     def __repr__(self):
         return f"<Quiz(id={self.id}, title='{self.title}')>"
 
 
+class PooledQuestion(Base):
+    """
+    Question pool model
+    Validated questions accumulated per article across generations, so
+    quizzes with a custom size or difficulty mix can reuse them
+    """
+    __tablename__ = "question_pool"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    url = Column(String(500), nullable=False)
+    lang = Column(String(16), nullable=False, default="en", server_default="en")
+    question_hash = Column(String(64), nullable=False)  # Normalized question text digest
+    difficulty = Column(String(10), nullable=False)
+    question_data = Column(Text, nullable=False)  # JSON string of the question
+    date_added = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_question_pool_lang_url", "lang", "url"),
+        Index("uq_question_pool_question", "lang", "url", "question_hash", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<PooledQuestion(id={self.id}, difficulty='{self.difficulty}')>"
+
+
+class SharedStateEntry(Base):
+    """
+    Shared state model
+    Cross-worker cache entries, counters and locks (see shared_state.py)
+    """
+    __tablename__ = "shared_state"
+
+    key = Column(String(255), primary_key=True)
+    value = Column(LargeBinary, nullable=True)
+    counter = Column(Integer, nullable=False, default=0, server_default="0")
+    expires_at = Column(Float, nullable=True, index=True)  # Unix time; NULL = no expiry
+
+    def __repr__(self):
+        return f"<SharedStateEntry(key='{self.key}')>"
+
+
+def _add_missing_columns():
+    """
+    Add columns introduced after a table was first created
+    create_all() only creates missing tables, so new columns (which are
+    always nullable or have a server default) are added with ALTER TABLE,
+    along with any indexes that don't exist yet. On PostgreSQL, INTEGER
+    columns the model now declares as BIGINT are widened (SQLite integers
+    are always 64-bit).
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name in existing:
+                    if (not IS_SQLITE and isinstance(column.type, BigInteger)
+                            and not isinstance(existing[column.name], BigInteger)):
+                        conn.exec_driver_sql(
+                            f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE BIGINT"
+                        )
+                        print(f"  → Widened column {table.name}.{column.name} to BIGINT")
+                    continue
+                ddl = (f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                       f"{column.type.compile(dialect=engine.dialect)}")
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.exec_driver_sql(ddl)
+                print(f"  → Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _backfill_quiz_languages():
+    """Set the language of quizzes stored before language partitioning"""
+    from wiki_lang import parse_wikipedia_url
+
+    db = SessionLocal()
+    try:
+        legacy = db.query(Quiz).filter(
+            Quiz.lang == "en",
+            ~Quiz.url.like("%://en.%")
+        ).all()
+        for quiz in legacy:
+            quiz.lang = parse_wikipedia_url(quiz.url)[0]
+        if legacy:
+            db.commit()
+    finally:
+        db.close()
+
+
 def init_db():
     """
     Initialize database tables
     Creates all tables defined by Base models if they don't exist
+    and upgrades existing tables with newly added columns
     """
     try:
         Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
+        _backfill_quiz_languages()
         print("✅ Database initialized successfully")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
@@ -78,6 +294,18 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    """
+    Read-only database session dependency
+    Uses the read pool so GET endpoints don't contend with quiz writes
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 # Initialize database on module import
 if __name__ == "__main__":
     init_db()
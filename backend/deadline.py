@@ -0,0 +1,92 @@
+"""
+Per-request deadlines
+A Deadline is created for each generation request and passed down through
+scraping, LLM generation and persistence. Each stage checks it before
+starting and caps its own timeout to the time left. The API also cancels
+it when the client disconnects, so work nobody will receive stops at the
+next check.
+"""
+
+from typing import Optional
+import os
+import threading
+import time
+
+# End-to-end budget for one generation request (0 disables it); keep it
+# below the proxy/worker timeout so clients get a 504 instead of a reset
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "90"))
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out"""
+
+    # Future of an LLM call that was still running when the request gave up;
+    # its answer is already paid for and can still be stored for the cache
+    late_result = None
+
+
+class RequestCancelled(Exception):
+    """The request was cancelled (the client disconnected)"""
+
+    late_result = None
+
+
+class Deadline:
+    """
+    Time budget and cancellation flag for one request
+    Thread-safe: cancel() may be called from the event loop while the
+    request's work runs in a worker thread.
+    """
+
+    def __init__(self, seconds: Optional[float] = REQUEST_DEADLINE_SECONDS):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self.reason = None
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        """Seconds left (infinite without a budget, 0 once cancelled)"""
+        if self._cancelled.is_set():
+            return 0.0
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def check(self, stage: str):
+        """
+        Raise if the request should stop before starting a stage
+
+        Raises:
+            RequestCancelled: the request was cancelled
+            DeadlineExceeded: the budget ran out
+        """
+        if self._cancelled.is_set():
+            raise RequestCancelled(f"Request cancelled at {stage} ({self.reason})")
+        if self.expired():
+            raise DeadlineExceeded(f"Request deadline of {self.seconds:.0f}s exceeded at {stage}")
+
+    def timeout(self, cap: float, stage: str) -> float:
+        """A stage's timeout: its own cap, shortened to the time left"""
+        self.check(stage)
+        return min(cap, self.remaining())
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to `seconds`, waking early on cancellation; True if cancelled"""
+        return self._cancelled.wait(seconds)
+
+
+def no_deadline() -> Deadline:
+    """Deadline for work without a budget (background jobs, scripts)"""
+    return Deadline(None)
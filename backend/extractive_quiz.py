@@ -0,0 +1,482 @@
+"""
+Extractive quiz generation
+Builds cloze questions straight from the article text: sentences are
+segmented, a key name or number is blanked out and the distractors are
+other terms of the same kind from the same article. Offline and
+deterministic (seeded by the article title), so it backs the local LLM
+provider for benchmarks and degraded mode, and pre-empts the LLM for
+short articles whose quiz passes the quality checks (build_checked_quiz).
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import random
+import re
+
+from wiki_lang import get_language_rules
+
+BLANK = "_____"
+
+# Same minimum as LLM-generated quizzes (validate_quiz_output)
+MIN_QUIZ_QUESTIONS = 7
+# Quality limits for a whole quiz
+MAX_ANSWER_REPEATS = 2
+MAX_NUMERIC_SHARE = 0.6
+
+# Usable sentence length (words, or characters for unspaced scripts)
+MIN_SENTENCE_WORDS = 6
+MAX_SENTENCE_WORDS = 40
+MIN_SENTENCE_CHARS_UNSPACED = 12
+MAX_SENTENCE_CHARS_UNSPACED = 120
+
+# Sentence-final abbreviations that don't end a sentence
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "mt.", "no.", "vs.", "jr.", "sr.",
+                  "e.g.", "i.e.", "inc.", "co.", "ltd.", "ca.", "approx."}
+
+_UPPER = "A-ZÀ-ÖØ-ÞĀ-ŽА-ЯЁ"
+_SENTENCE_BREAK = re.compile(rf"(?<=[.!?])\s+(?=[\"'“«(]?[{_UPPER}0-9])")
+_SENTENCE_BREAK_UNSPACED = re.compile(r"(?<=[。！？])")
+_NUMBER = re.compile(r"(?<![\w.,])(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?![\w.]\d|\w)")
+# No word boundaries in unspaced scripts: "1868年"
+_NUMBER_UNSPACED = re.compile(r"(?<![\d.,])(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?![\d.,]?\d)")
+_YEAR = re.compile(r"1\d{3}|20\d{2}")
+_CONNECTORS = r"of|the|de|la|le|van|von|der|den|du|di|da|del"
+_NAME = re.compile(rf"[{_UPPER}][\w'’\-]*(?:\s+(?:(?:{_CONNECTORS})\s+)?[{_UPPER}][\w'’\-]*)*")
+_QUOTED_UNSPACED = re.compile(r"「([^」]{2,20})」|《([^》]{2,20})》|『([^』]{2,20})』")
+
+# Capitalized words that are never answers on their own (English)
+_NOT_NAMES_EN = {
+    "January", "February", "March", "April", "May", "June", "July", "August", "September",
+    "October", "November", "December", "Monday", "Tuesday", "Wednesday", "Thursday",
+    "Friday", "Saturday", "Sunday"
+}
+
+# Entity classification cues (English; other languages only get acronyms
+# and keyword matches for organizations)
+_ORG_WORDS = {
+    "Foundation", "University", "College", "Company", "Corporation", "Inc", "Institute",
+    "Council", "Association", "Society", "Party", "Agency", "Group", "Bank", "Club",
+    "Museum", "League", "Committee", "Ministry", "Department", "Army", "Navy", "Academy",
+    "Organization", "Organisation", "Union", "Federation", "Records", "Studios", "Laboratory"
+}
+_PLACE_WORDS = {
+    "River", "Mountain", "Mountains", "Mount", "Lake", "City", "County", "Island", "Islands",
+    "Sea", "Ocean", "Valley", "Province", "State", "Republic", "Kingdom", "Bay", "Desert",
+    "Peninsula", "Street", "District", "Region", "Church", "Cathedral", "Abbey", "Castle",
+    "Palace", "Bridge", "Tower", "Square", "Station"
+}
+# Final words of names that are things, never people ("Analytical Engine")
+_THING_WORDS = {
+    "Engine", "Machine", "Computer", "War", "Act", "Prize", "Award", "Theory", "Law", "Treaty",
+    "Revolution", "Empire", "Dynasty", "Language", "System", "Project", "Program", "Programme",
+    "Series", "Festival", "Game", "Games", "Cup", "Notes"
+}
+_PLACE_CUE = re.compile(r"\b(?:in|at|near|from|across|throughout)\s+(?:the\s+)?$")
+_PERSON_CUE = re.compile(r"\b(?:by|Dr\.|Mr\.|Mrs\.|Ms\.|Sir|President|King|Queen|Saint)\s+$")
+_ACRONYM = re.compile(r"[A-Z]{2,6}")
+
+
+def split_sentences(text: str, lang: str = "en") -> List[str]:
+    """Segment article text into sentences (handles common abbreviations)"""
+    if not get_language_rules(lang)["spaced"]:
+        return [s.strip() for s in _SENTENCE_BREAK_UNSPACED.split(text) if s.strip()]
+
+    sentences = []
+    for part in _SENTENCE_BREAK.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        if sentences:
+            last_word = sentences[-1].rsplit(" ", 1)[-1].lower()
+            # "Dr. Smith", "J. R. R. Tolkien": the break wasn't a sentence end
+            if last_word in _ABBREVIATIONS or re.fullmatch(r"[a-z]\.", last_word):
+                sentences[-1] += " " + part
+                continue
+        sentences.append(part)
+    return sentences
+
+
+def _is_usable(sentence: str, spaced: bool) -> bool:
+    if spaced:
+        return MIN_SENTENCE_WORDS <= len(sentence.split()) <= MAX_SENTENCE_WORDS
+    return MIN_SENTENCE_CHARS_UNSPACED <= len(sentence) <= MAX_SENTENCE_CHARS_UNSPACED
+
+
+def proper_words(sentences: List[str]) -> set:
+    """
+    Capitalized words seen somewhere other than a sentence start
+    A capitalized first word only counts as a name if it's in this set.
+    """
+    words = set()
+    for sentence in sentences:
+        for word in re.findall(rf"(?<=[\s(\"“«])[{_UPPER}][\w'’\-]*", sentence):
+            words.add(word)
+    return words
+
+
+def extract_terms(sentence: str, lang: str = "en",
+                  proper: Optional[set] = None) -> List[Tuple[str, str]]:
+    """
+    Candidate answer terms in a sentence
+
+    Args:
+        sentence: One sentence of article text
+        lang: Wikipedia language of the article
+        proper: Words known to be names (see proper_words())
+
+    Returns:
+        list: (term, kind) with kind "year", "number" or "name"
+    """
+    spaced = get_language_rules(lang)["spaced"]
+    terms = []
+    for match in (_NUMBER if spaced else _NUMBER_UNSPACED).finditer(sentence):
+        number = match.group()
+        terms.append((number, "year" if _YEAR.fullmatch(number) else "number"))
+
+    if spaced:
+        proper = proper or set()
+        for match in _NAME.finditer(sentence):
+            name = re.sub(r"['’]s$", "", match.group()).strip("'’-")
+            if sentence[match.end():match.end() + 1] == "." and \
+                    f"{name.split()[-1].lower()}." in _ABBREVIATIONS:
+                continue  # Cut off at an abbreviation: "Church of St. Mary"
+            if match.start() == 0:
+                # Drop a capitalized sentence-initial word that isn't a name
+                first, _, rest = name.partition(" ")
+                if first not in proper:
+                    name = rest if rest and rest[0].isupper() else ""
+            if len(name) >= 2 and not (lang == "en" and name in _NOT_NAMES_EN):
+                terms.append((name, "name"))
+    else:
+        for match in _QUOTED_UNSPACED.finditer(sentence):
+            terms.append((next(g for g in match.groups() if g), "name"))
+    return terms
+
+
+def _rng(title: str) -> random.Random:
+    return random.Random(int(hashlib.sha256(title.encode("utf-8")).hexdigest()[:16], 16))
+
+
+def _title_core(title: str) -> str:
+    """Title without its disambiguation suffix, e.g. 'Python (programming language)'"""
+    return re.sub(r"\s*\(.*\)$", "", title).strip().lower()
+
+
+def _number_value(number: str) -> float:
+    return float(number.replace(",", ""))
+
+
+def _format_like(value: float, original: str) -> str:
+    decimals = len(original.split(".")[1]) if "." in original else 0
+    return f"{value:,.{decimals}f}" if "," in original else f"{value:.{decimals}f}"
+
+
+def _numeric_distractors(answer: str, kind: str, rng: random.Random) -> List[str]:
+    """Plausible nearby values when the article has too few numbers of the kind"""
+    value = _number_value(answer)
+    if kind == "year":
+        offsets = rng.sample([o for o in range(-15, 16) if o], 10)
+        values = [value + o for o in offsets]
+    else:
+        values = [value * f for f in rng.sample([0.5, 0.75, 1.25, 1.5, 2, 3, 10], 7)]
+    results = []
+    for v in values:
+        text = _format_like(v, answer)
+        if text != answer and text not in results and v > 0:
+            results.append(text)
+    return results
+
+
+def _distractors(answer: str, kind: str, sentence: str, pool: Dict[str, Counter],
+                 entities: Dict[str, Optional[str]], rng: random.Random) -> List[str]:
+    """Three wrong options of the same kind, preferring terms from the article"""
+    answer_lower = answer.lower()
+    candidates = [
+        term for term, _ in pool[kind].most_common()
+        if term not in sentence
+        and answer_lower not in term.lower() and term.lower() not in answer_lower
+    ]
+    if kind == "name":
+        # Names of the same entity kind (a person for a person, etc.),
+        # preferring a similar length
+        candidates = [t for t in candidates if entities.get(t) == entities.get(answer)]
+        words = len(answer.split())
+        candidates.sort(key=lambda t: abs(len(t.split()) - words))
+    elif kind == "number":
+        # Same shape: decimals with decimals, within an order of magnitude
+        value = _number_value(answer)
+        candidates = [
+            t for t in candidates
+            if ("." in t) == ("." in answer) and value / 10 <= _number_value(t) <= value * 10
+        ]
+    chosen = rng.sample(candidates[:8], min(3, len(candidates[:8])))
+    if len(chosen) < 3 and kind in ("year", "number"):
+        chosen += [d for d in _numeric_distractors(answer, kind, rng) if d not in chosen][:3 - len(chosen)]
+    return chosen
+
+
+def _difficulty(term: str, kind: str, counts: Counter) -> str:
+    if kind == "number":
+        return "hard"
+    if kind == "year":
+        return "medium"
+    frequency = counts[term]
+    return "easy" if frequency >= 3 else "medium" if frequency == 2 else "hard"
+
+
+def candidate_questions(article_text: str, article_title: str, lang: str = "en") -> List[dict]:
+    """
+    Every cloze question the article supports (one per usable sentence),
+    in article order
+    """
+    spaced = get_language_rules(lang)["spaced"]
+    sentences = split_sentences(article_text, lang)
+    proper = proper_words(sentences) if spaced else set()
+    title_core = _title_core(article_title)
+    rng = _rng(article_title)
+
+    per_sentence = [(s, extract_terms(s, lang, proper)) for s in sentences]
+    counts = Counter(term for _, terms in per_sentence for term, _ in terms)
+    pool = {"year": Counter(), "number": Counter(), "name": Counter()}
+    for _, terms in per_sentence:
+        for term, kind in terms:
+            pool[kind][term] += 1
+    entities = entity_kinds(article_text, pool["name"], lang)
+
+    questions = []
+    for sentence, terms in per_sentence:
+        if not _is_usable(sentence, spaced):
+            continue
+        # Most frequent term first: it's what the article is about
+        usable = [(t, k) for t, k in terms if t.lower() != title_core]
+        for term, kind in sorted(usable, key=lambda tk: -counts[tk[0]]):
+            if kind == "name" and lang == "en" and entities.get(term) is None:
+                continue  # Can't pick distractors of the same kind
+            wrong = _distractors(term, kind, sentence, pool, entities, rng)
+            if len(wrong) < 3:
+                continue
+            options = wrong + [term]
+            rng.shuffle(options)
+            question = {
+                "question": sentence.replace(term, BLANK),
+                "options": options,
+                "answer": term,
+                "difficulty": _difficulty(term, kind, counts),
+                "explanation": sentence,
+                "section": "General",
+                "kind": kind
+            }
+            if kind == "name":
+                question["option_kinds"] = [entities.get(option) for option in options]
+            if not question_problems(question):
+                questions.append(question)
+                break
+    return questions
+
+
+def question_problems(question: dict) -> List[str]:
+    """Reasons a cloze question is unfit to ask (empty list if it's fine)"""
+    problems = []
+    text = question["question"]
+    lowered = text.lower()
+    if text.count(BLANK) != 1:
+        problems.append("answer appears more than once")
+    if question["answer"].lower() in lowered.replace(BLANK, " "):
+        problems.append("answer leaks into the question")
+    if any(option.lower() in lowered for option in question["options"] if option != question["answer"]):
+        problems.append("distractor appears in the question")
+    if len({option.lower() for option in question["options"]}) != 4:
+        problems.append("duplicate options")
+    if len(text.replace(BLANK, " ").split()) < 4:
+        problems.append("too little context")
+    # Set on extractive name questions (internal, stripped before storing)
+    if len(set(question.get("option_kinds") or [None])) > 1:
+        problems.append("options of different entity kinds")
+    return problems
+
+
+def quiz_problems(quiz: dict) -> List[str]:
+    """
+    Reasons an extractive quiz is not good enough to serve
+    (an empty list means it can be used instead of an LLM quiz)
+    """
+    questions = quiz["quiz"]
+    problems = []
+    if len(questions) < MIN_QUIZ_QUESTIONS:
+        problems.append(f"only {len(questions)} questions (minimum {MIN_QUIZ_QUESTIONS})")
+    if not questions:
+        return problems
+
+    repeats = Counter(q["answer"] for q in questions).most_common(1)[0]
+    if repeats[1] > MAX_ANSWER_REPEATS:
+        problems.append(f"answer '{repeats[0]}' used {repeats[1]} times")
+    numeric = sum(1 for q in questions if _NUMBER.fullmatch(q["answer"]))
+    if numeric / len(questions) > MAX_NUMERIC_SHARE:
+        problems.append(f"{numeric} of {len(questions)} answers are numbers")
+    if len({q["difficulty"] for q in questions}) < 2:
+        problems.append("no difficulty spread")
+    if not quiz["summary"]:
+        problems.append("no summary")
+    return problems
+
+
+def _spread(questions: List[dict], count: int) -> List[dict]:
+    """Pick questions evenly across the article rather than from the intro only"""
+    if len(questions) <= count:
+        return list(questions)
+    step = len(questions) / count
+    return [questions[int(i * step)] for i in range(count)]
+
+
+def select_questions(questions: List[dict], difficulty_counts: Dict[str, int]) -> List[dict]:
+    """Pick up to the requested number of questions per difficulty"""
+    selected = []
+    for difficulty, wanted in difficulty_counts.items():
+        matching = [q for q in questions if q["difficulty"] == difficulty]
+        selected.extend(_spread(matching, wanted))
+    return selected
+
+
+def _strip_internal(question: dict) -> dict:
+    return {k: v for k, v in question.items() if k not in ("kind", "option_kinds")}
+
+
+def build_quiz(article_text: str, article_title: str, lang: str = "en",
+               num_questions: int = 10) -> dict:
+    """
+    Build a complete quiz (same shape as the LLM output) from the article
+
+    Args:
+        article_text: Cleaned article text
+        article_title: Article title
+        lang: Wikipedia language of the article
+        num_questions: Maximum number of questions
+
+    Returns:
+        dict: title, summary, key_entities, sections, quiz and related_topics
+    """
+    candidates = candidate_questions(article_text, article_title, lang)
+    # Take questions across the article, then top up from what's left
+    quiz = _spread(candidates, num_questions)
+
+    sentences = split_sentences(article_text, lang)
+    proper = proper_words(sentences)
+    names = Counter(
+        term for s in sentences
+        for term, kind in extract_terms(s, lang, proper)
+        if kind == "name"
+    )
+    title_core = _title_core(article_title)
+
+    return {
+        "title": article_title,
+        "summary": " ".join(sentences[:2])[:600],
+        "key_entities": classify_entities(article_text, names, lang),
+        "sections": [],
+        "quiz": [_strip_internal(q) for q in quiz],
+        "related_topics": [n for n, _ in names.most_common(8) if n.lower() != title_core][:5]
+    }
+
+
+def _standalone_mentions(word: str, article_text: str) -> int:
+    """Mentions of a word that aren't part of a longer capitalized name"""
+    count = 0
+    for match in re.finditer(rf"\b{re.escape(word)}\b", article_text):
+        previous = article_text[:match.start()].rstrip().rsplit(None, 1)[-1:]
+        if not previous or not previous[0][0].isupper() or previous[0][-1] in ".!?":
+            count += 1
+    return count
+
+
+def _could_be_surname(word: str, article_text: str) -> bool:
+    """Not a keyword of another entity kind, nor a common noun of the article"""
+    return word not in _ORG_WORDS | _PLACE_WORDS | _THING_WORDS and \
+        not re.search(rf"\b{re.escape(word.lower())}\b", article_text)
+
+
+def _entity_kind(name: str, article_text: str, lang: str = "en") -> Optional[str]:
+    """
+    "people", "organizations", "locations" or "things" for a name, None if unclear
+    Keyword and context cues ("in the ...", "by ...", later mentions by
+    surname alone) decide; names with no clear cue are left unclassified.
+    """
+    words = name.split()
+    if _ACRONYM.fullmatch(name) or _ORG_WORDS.intersection(words):
+        return "organizations"
+    if lang != "en":
+        return None
+    if _PLACE_WORDS.intersection(words):
+        return "locations"
+    contexts = [article_text[max(0, m.start() - 20):m.start()]
+                for m in re.finditer(re.escape(name), article_text)]
+    place_votes = sum(1 for c in contexts if _PLACE_CUE.search(c))
+    person_votes = sum(1 for c in contexts if _PERSON_CUE.search(c))
+    if place_votes > person_votes:
+        return "locations"
+    if not _could_be_surname(words[-1], article_text):
+        return "things"  # "Analytical Engine", "Seven Years' War"
+    if "of" in words:
+        return None
+    # People are usually mentioned again by surname alone
+    by_surname = len(words) >= 2 and _standalone_mentions(words[-1], article_text) > 0
+    return "people" if person_votes or by_surname else None
+
+
+def entity_kinds(article_text: str, names: Counter, lang: str = "en") -> Dict[str, Optional[str]]:
+    """
+    Entity kind of every extracted name (see _entity_kind)
+    For choosing distractors, unclassified full names that look like a
+    person's ("Andrew Crosse") and single words of a person's name
+    ("Lovelace" for "Ada Lovelace") count as people too.
+    """
+    kinds = {name: _entity_kind(name, article_text, lang) for name in names}
+    if lang != "en":
+        return kinds
+    for name, kind in kinds.items():
+        words = name.split()
+        if kind is None and len(words) >= 2 and "of" not in words:
+            kinds[name] = "people"  # Surname already checked by _entity_kind
+    person_words = {
+        word for name, kind in kinds.items() if kind == "people" and " " in name
+        for word in name.split()
+    }
+    for name, kind in kinds.items():
+        if kind is None and name in person_words:
+            kinds[name] = "people"
+    return kinds
+
+
+def classify_entities(article_text: str, names: Counter, lang: str = "en",
+                      limit: int = 10) -> Dict[str, List[str]]:
+    """Sort extracted names into people, organizations and locations"""
+    entities = {"people": [], "organizations": [], "locations": []}
+    for name, _ in names.most_common():
+        kind = _entity_kind(name, article_text, lang)
+        if kind in entities and len(entities[kind]) < limit:
+            entities[kind].append(name)
+    return entities
+
+
+def build_checked_quiz(article_text: str, article_title: str,
+                       lang: str = "en") -> Tuple[Optional[dict], List[str]]:
+    """
+    Build an extractive quiz and run the quality checks on it
+
+    Returns:
+        tuple: (quiz data or None if it failed the checks, problems found)
+    """
+    quiz = build_quiz(article_text, article_title, lang)
+    problems = quiz_problems(quiz)
+    return (None if problems else quiz), problems
+
+
+def build_questions(article_text: str, article_title: str, difficulty_counts: Dict[str, int],
+                    exclude_questions: Optional[List[str]] = None, lang: str = "en") -> List[dict]:
+    """Extractive counterpart of llm_quiz_generator.generate_questions()"""
+    excluded = {q.strip().lower() for q in (exclude_questions or [])}
+    candidates = [
+        q for q in candidate_questions(article_text, article_title, lang)
+        if q["question"].strip().lower() not in excluded
+    ]
+    return [_strip_internal(q) for q in select_questions(candidates, difficulty_counts)]
@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration: multiple Uvicorn workers behind one port
+
+Start from the backend directory:
+    gunicorn main:app -c gunicorn.conf.py
+
+Schema setup runs once in the master before workers are forked; each
+worker then opens its own database connections and warms up on startup.
+Workers coordinate through shared_state (database or REDIS_URL).
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Quiz generation can take a while (scrape + LLM)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 30
+
+
+def on_starting(server):
+    """Create and migrate the schema once, before any worker exists"""
+    from database import engine, init_db
+    from search import init_search_index
+
+    init_db()  # Includes the shared_state table
+    init_search_index()
+    # Don't hand the master's connections down to the workers
+    engine.dispose()
+
+
+def post_fork(server, worker):
+    """Drop pooled connections inherited from the master (never shared across processes)"""
+    from database import engine, read_engine
+
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
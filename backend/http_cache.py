@@ -0,0 +1,45 @@
+"""
+HTTP caching helpers for quiz payloads
+Quizzes never change once written, so they get ETags and long
+Cache-Control lifetimes that browsers and CDNs can revalidate cheaply.
+The ETags are weak: the compression middleware serves the same quiz as
+identity, gzip or br, and a strong validator would have to differ per
+content coding.
+"""
+
+from typing import Optional
+import hashlib
+import os
+
+from database import Quiz
+
+QUIZ_CACHE_MAX_AGE = int(os.getenv("QUIZ_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+QUIZ_CACHE_CONTROL = f"public, max-age={QUIZ_CACHE_MAX_AGE}, immutable"
+
+
+def quiz_etag(quiz: Quiz) -> str:
+    """Weak ETag derived from the quiz id and a hash of its stored content"""
+    digest = hashlib.sha256(quiz.full_quiz_data.encode("utf-8")).hexdigest()[:20]
+    return f'W/"q{quiz.id}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against an ETag
+    Uses weak comparison as RFC 9110 requires for If-None-Match
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+
+def quiz_cache_headers(quiz: Quiz, etag: Optional[str] = None) -> dict:
+    """Response headers for a cacheable quiz payload"""
+    return {
+        "ETag": etag or quiz_etag(quiz),
+        "Cache-Control": QUIZ_CACHE_CONTROL
+    }
@@ -1,34 +1,36 @@
 """
-Diagnostic Quiz Generator - Troubleshoots empty related topics
+Quiz generation with pluggable LLM providers
+- GeminiProvider: Google Gemini through LangChain (any Gemini model)
+- LocalProvider: offline extractive generation (benchmarks, degraded mode)
+Each request is routed by article length (short articles go to a faster
+model) and retried on a fallback provider when the routed one times out.
 """
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
 import json
+import time
+
+import extractive_quiz
+from wiki_lang import get_language_rules, count_words
+from deadline import Deadline, DeadlineExceeded, RequestCancelled, no_deadline
 
 load_dotenv()
 
+# Providers are given as "name" or "name:model",
+# e.g. "gemini:gemini-2.5-flash" or "local"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini:gemini-2.5-flash")
+# Used for articles of up to LLM_SHORT_ARTICLE_WORDS words (empty disables routing)
+LLM_FAST_PROVIDER = os.getenv("LLM_FAST_PROVIDER", "gemini:gemini-2.5-flash-lite")
+LLM_SHORT_ARTICLE_WORDS = int(os.getenv("LLM_SHORT_ARTICLE_WORDS", "1500"))
+# Tried when the routed provider times out (empty disables the fallback)
+LLM_FALLBACK_PROVIDER = os.getenv("LLM_FALLBACK_PROVIDER", "")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
 
-def generate_quiz(article_text: str, article_title: str) -> dict:
-    """Generate quiz with detailed diagnostics"""
-    
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
-    
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",  # Using the correct model for your API
-        google_api_key=api_key,
-        temperature=0.7,
-        max_tokens=8000
-    )
-    
-    # Simplified, clearer prompt focusing on related topics
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an educational quiz creator. Create a quiz from the article.
+QUIZ_SYSTEM_PROMPT = """You are an educational quiz creator. Create a quiz from the article.
 
 IMPORTANT: Return a valid JSON object with this EXACT structure:
 
@@ -68,63 +70,322 @@ For related_topics, suggest topics like:
 - Applications or use cases
 - Historical context or future developments
 
-Return ONLY the JSON object, no other text."""),
-        ("human", """Article: {title}
+Return ONLY the JSON object, no other text."""
+
+QUIZ_HUMAN_PROMPT = """Article: {title}
+Language: {language}
 
 Content:
 {article_text}
 
-Generate the quiz JSON with all required fields including related_topics.""")
-    ])
-    
-    # Don't use JsonOutputParser initially - let's see raw output
-    chain = prompt | llm
-    
-    try:
-        print(f"\n{'='*70}")
-        print(f"🤖 GENERATING QUIZ: {article_title}")
-        print(f"{'='*70}\n")
-        
-        # Get raw response
-        raw_response = chain.invoke({
-            "title": article_title,
-            "article_text": article_text[:20000]
-        })
-        
-        print(f"{'='*70}")
-        print("RAW RESPONSE FROM GEMINI:")
-        print(f"{'='*70}")
-        print(f"Type: {type(raw_response)}")
-        
+Generate the quiz JSON with all required fields including related_topics.
+Write all text values (title, summary, questions, options, explanations, sections, related_topics) in {language}."""
+
+QUESTIONS_SYSTEM_PROMPT = """You are an educational quiz creator. Write additional quiz questions about the article.
+
+Return a valid JSON object with this EXACT structure:
+
+{{
+  "quiz": [
+    {{
+      "question": "question text?",
+      "options": ["A", "B", "C", "D"],
+      "answer": "A",
+      "difficulty": "easy",
+      "explanation": "explanation text",
+      "section": "section name"
+    }}
+  ]
+}}
+
+REQUIREMENTS:
+1. Generate exactly the requested number of questions per difficulty
+2. Each question must have exactly 4 options
+3. Answer must exactly match one option
+4. Do not repeat or rephrase any of the existing questions
+
+Return ONLY the JSON object, no other text."""
+
+QUESTIONS_HUMAN_PROMPT = """Article: {title}
+Language: {language}
+
+Content:
+{article_text}
+
+Questions wanted: {counts}
+
+Existing questions (do not repeat):
+{existing}
+
+Write all text values in {language}."""
+
+
+class LLMTimeoutError(TimeoutError):
+    """A provider didn't answer within its time budget"""
+
+
+def _strip_code_fences(response_text: str) -> str:
+    """Remove a markdown code block wrapped around a JSON response"""
+    if response_text.startswith("```"):
+        print("⚠️  Removing markdown code blocks...")
+        lines = response_text.split("\n")
+        # Remove first and last lines (```)
+        response_text = "\n".join(lines[1:-1])
+        if response_text.startswith("json"):
+            response_text = response_text[4:].strip()
+    return response_text
+
+
+class QuizProvider:
+    """
+    Interface for quiz generation backends
+    Providers return raw output; generate_quiz() and generate_questions()
+    validate it the same way whichever provider produced it.
+    """
+    name = "provider"
+    # Whether specs may name a model ("name:model")
+    takes_model = True
+
+    def generate_quiz(self, article_text: str, article_title: str, lang: str) -> dict:
+        """Full quiz: title, summary, key_entities, sections, quiz, related_topics"""
+        raise NotImplementedError
+
+    def generate_questions(self, article_text: str, article_title: str, wanted: Dict[str, int],
+                           exclude_questions: List[str], lang: str) -> List[dict]:
+        """Additional questions, `wanted` per difficulty"""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Prepare clients ahead of the first request"""
+
+
+class GeminiProvider(QuizProvider):
+    """Google Gemini chat model through LangChain"""
+
+    def __init__(self, model: str = "gemini-2.5-flash", temperature: float = 0.7,
+                 max_tokens: int = 8000, timeout: float = LLM_TIMEOUT_SECONDS):
+        self.name = f"gemini:{model}"
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self._client = None
+
+    def _llm(self):
+        """Chat model client (built once per worker)"""
+        if self._client is None:
+            # Imported on first use: the Gemini stack takes seconds to import
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+            options = {}
+            if LLM_FALLBACK_PROVIDER:
+                # Retries must fit in the timeout or the fallback never gets a chance
+                options["max_retries"] = 1
+            self._client = ChatGoogleGenerativeAI(
+                model=self.model,
+                google_api_key=api_key,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                timeout=self.timeout,
+                **options
+            )
+        return self._client
+
+    def warm_up(self):
+        import langchain_core.prompts  # noqa: F401
+        import langchain_google_genai  # noqa: F401
+
+        if os.getenv("GEMINI_API_KEY"):
+            self._llm()
+
+    def _invoke(self, system_prompt: str, human_prompt: str, variables: dict) -> str:
+        """Run a prompt and return the response text without code fences"""
+        from langchain_core.prompts import ChatPromptTemplate
+
+        prompt = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", human_prompt)])
+        raw_response = (prompt | self._llm()).invoke(variables)
+
         # Extract content from response object
         if hasattr(raw_response, 'content'):
             response_text = raw_response.content
         else:
             response_text = str(raw_response)
-        
+        return _strip_code_fences(response_text.strip())
+
+    def generate_quiz(self, article_text: str, article_title: str, lang: str) -> dict:
+        response_text = self._invoke(QUIZ_SYSTEM_PROMPT, QUIZ_HUMAN_PROMPT, {
+            "title": article_title,
+            "language": get_language_rules(lang)["name"],
+            "article_text": article_text[:20000]
+        })
+
+        print(f"{'='*70}")
+        print(f"RAW RESPONSE FROM {self.name.upper()}:")
+        print(f"{'='*70}")
         print(f"\nResponse length: {len(response_text)} characters")
         print(f"\nFirst 500 chars:")
         print(response_text[:500])
         print(f"\nLast 500 chars:")
         print(response_text[-500:])
         print(f"{'='*70}\n")
-        
-        # Clean the response
-        response_text = response_text.strip()
-        
-        # Remove markdown code blocks if present
-        if response_text.startswith("```"):
-            print("⚠️  Removing markdown code blocks...")
+
+        try:
+            print("Attempting to parse JSON...")
+            return json.loads(response_text)
+        except json.JSONDecodeError as e:
+            print(f"\n❌ JSON PARSING ERROR:")
+            print(f"  Error: {str(e)}")
+            print(f"  Position: line {e.lineno}, column {e.colno}")
+            print(f"\n  Problematic section:")
             lines = response_text.split("\n")
-            # Remove first and last lines (```)
-            response_text = "\n".join(lines[1:-1])
-            if response_text.startswith("json"):
-                response_text = response_text[4:].strip()
-        
-        # Parse JSON
-        print("Attempting to parse JSON...")
-        result = json.loads(response_text)
-        
+            start = max(0, e.lineno - 3)
+            end = min(len(lines), e.lineno + 3)
+            for i in range(start, end):
+                marker = ">>>" if i == e.lineno - 1 else "   "
+                print(f"  {marker} {i+1}: {lines[i]}")
+            raise
+
+    def generate_questions(self, article_text: str, article_title: str, wanted: Dict[str, int],
+                           exclude_questions: List[str], lang: str) -> List[dict]:
+        response_text = self._invoke(QUESTIONS_SYSTEM_PROMPT, QUESTIONS_HUMAN_PROMPT, {
+            "title": article_title,
+            "language": get_language_rules(lang)["name"],
+            "article_text": article_text[:20000],
+            "counts": ", ".join(f"{n} {d}" for d, n in wanted.items()),
+            "existing": "\n".join(f"- {q}" for q in exclude_questions) or "(none)"
+        })
+        return json.loads(response_text).get("quiz", [])
+
+
+class LocalProvider(QuizProvider):
+    """
+    Offline extractive generation (see extractive_quiz.py)
+    No API calls and deterministic output: for benchmarks, load tests and
+    as a degraded-mode fallback.
+    """
+    name = "local"
+    takes_model = False
+
+    def generate_quiz(self, article_text: str, article_title: str, lang: str) -> dict:
+        return extractive_quiz.build_quiz(article_text, article_title, lang)
+
+    def generate_questions(self, article_text: str, article_title: str, wanted: Dict[str, int],
+                           exclude_questions: List[str], lang: str) -> List[dict]:
+        return extractive_quiz.build_questions(
+            article_text, article_title, wanted, exclude_questions, lang
+        )
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "local": LocalProvider
+}
+
+
+@lru_cache(maxsize=None)
+def get_provider(spec: str) -> QuizProvider:
+    """
+    Provider for a spec such as "gemini:gemini-2.5-flash" or "local"
+    Instances are shared per worker so their clients are reused.
+    """
+    name, _, model = spec.strip().partition(":")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{name}' (available: {', '.join(PROVIDERS)})")
+    if model and not PROVIDERS[name].takes_model:
+        raise ValueError(f"LLM provider '{name}' doesn't take a model (got '{spec.strip()}')")
+    return PROVIDERS[name](model) if model else PROVIDERS[name]()
+
+
+def route_provider(article_text: str, lang: str = "en") -> QuizProvider:
+    """Pick the provider for an article: short articles go to the fast one"""
+    if LLM_FAST_PROVIDER and count_words(article_text, lang) <= LLM_SHORT_ARTICLE_WORDS:
+        return get_provider(LLM_FAST_PROVIDER)
+    return get_provider(LLM_PROVIDER)
+
+
+def warm_up():
+    """
+    Import the LLM stack and build the configured providers' clients ahead
+    of the first generation (client creation is skipped without an API key)
+    """
+    for spec in {LLM_PROVIDER, LLM_FAST_PROVIDER, LLM_FALLBACK_PROVIDER}:
+        if spec:
+            get_provider(spec).warm_up()
+
+
+# Provider calls run here so they can be abandoned on timeout or cancellation
+# (an abandoned call still finishes in the background, bounded by its client timeout)
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm")
+# How often a waiting request checks whether it was cancelled
+CANCEL_POLL_SECONDS = 0.25
+
+
+def _is_timeout(error: Exception) -> bool:
+    """Timeouts raised by us or by a provider's client library"""
+    if isinstance(error, (DeadlineExceeded, RequestCancelled)):
+        return False  # The request itself is out of time; no point falling back
+    return isinstance(error, (TimeoutError, FutureTimeoutError)) or \
+        type(error).__name__ in ("DeadlineExceeded", "ReadTimeout", "ConnectTimeout", "Timeout")
+
+
+def _call_provider(provider: QuizProvider, method: str, deadline: Deadline,
+                   timeout: float = LLM_TIMEOUT_SECONDS, **kwargs):
+    """
+    Call a provider within its timeout, giving up early if the request is cancelled
+    When the request stops while the call is running, the call's future is
+    attached to the exception as `late_result`.
+    """
+    timeout = deadline.timeout(timeout, provider.name)
+    give_up_at = time.monotonic() + timeout
+    future = _executor.submit(getattr(provider, method), **kwargs)
+    while True:
+        try:
+            return future.result(timeout=min(CANCEL_POLL_SECONDS, max(0.0, give_up_at - time.monotonic())))
+        except FutureTimeoutError:
+            if deadline.cancelled or time.monotonic() >= give_up_at:
+                started = not future.cancel()
+                try:
+                    deadline.check(provider.name)
+                except (DeadlineExceeded, RequestCancelled) as stopped:
+                    stopped.late_result = future if started else None
+                    raise
+                raise LLMTimeoutError(f"{provider.name} did not answer within {timeout:.0f}s")
+
+
+def _generate(method: str, article_text: str, lang: str, deadline: Optional[Deadline] = None, **kwargs):
+    """Run a provider method on the routed provider, falling back on timeout"""
+    deadline = deadline or no_deadline()
+    provider = route_provider(article_text, lang)
+    print(f"🧭 Provider: {provider.name}")
+    try:
+        return _call_provider(provider, method, deadline, article_text=article_text, lang=lang, **kwargs)
+    except Exception as e:
+        if not LLM_FALLBACK_PROVIDER or not _is_timeout(e):
+            raise
+        fallback = get_provider(LLM_FALLBACK_PROVIDER)
+        if fallback is provider:
+            raise
+        print(f"⏱️  {provider.name} timed out, falling back to {fallback.name}")
+        return _call_provider(fallback, method, deadline, article_text=article_text, lang=lang, **kwargs)
+
+
+def generate_quiz(article_text: str, article_title: str, lang: str = "en",
+                  deadline: Optional[Deadline] = None) -> dict:
+    """
+    Generate quiz with detailed diagnostics (written in the article's language)
+    The provider call is limited to the time left on the request deadline.
+    """
+    try:
+        print(f"\n{'='*70}")
+        print(f"🤖 GENERATING QUIZ: {article_title}")
+        print(f"{'='*70}\n")
+
+        result = _generate("generate_quiz", article_text, lang, deadline, article_title=article_title)
+
         print(f"\n{'='*70}")
         print("PARSED JSON STRUCTURE:")
         print(f"{'='*70}")
@@ -145,12 +406,6 @@ Generate the quiz JSON with all required fields including related_topics.""")
         
         print(f"{'='*70}\n")
         
-        # Show full related_topics
-        if 'related_topics' in result:
-            print(f"RELATED TOPICS CONTENT:")
-            print(f"  {result['related_topics']}")
-            print()
-        
         # Validate
         validated_result = validate_quiz_output(result, article_title)
         
@@ -161,17 +416,8 @@ Generate the quiz JSON with all required fields including related_topics.""")
         
         return validated_result
         
-    except json.JSONDecodeError as e:
-        print(f"\n❌ JSON PARSING ERROR:")
-        print(f"  Error: {str(e)}")
-        print(f"  Position: line {e.lineno}, column {e.colno}")
-        print(f"\n  Problematic section:")
-        lines = response_text.split("\n")
-        start = max(0, e.lineno - 3)
-        end = min(len(lines), e.lineno + 3)
-        for i in range(start, end):
-            marker = ">>>" if i == e.lineno - 1 else "   "
-            print(f"  {marker} {i+1}: {lines[i]}")
+    except (DeadlineExceeded, RequestCancelled) as e:
+        print(f"\n⏹️  Generation stopped: {e}")
         raise
     except Exception as e:
         print(f"\n❌ ERROR: {type(e).__name__}")
@@ -181,6 +427,39 @@ Generate the quiz JSON with all required fields including related_topics.""")
         raise
 
 
+def generate_questions(article_text: str, article_title: str, difficulty_counts: dict,
+                       exclude_questions: list = None, lang: str = "en",
+                       deadline: Optional[Deadline] = None) -> list:
+    """
+    Generate only additional questions for an article
+    Used to top up a question pool: the prompt asks for exact counts per
+    difficulty and lists existing questions so they aren't repeated.
+    
+    Args:
+        article_text: Cleaned article text
+        article_title: Article title
+        difficulty_counts: Number of questions wanted per difficulty
+        exclude_questions: Question texts that already exist
+        lang: Wikipedia language the questions should be written in
+        deadline: Request deadline bounding the provider call
+        
+    Returns:
+        list: Validated question dicts (may be fewer than requested)
+    """
+    wanted = {d: n for d, n in difficulty_counts.items() if n > 0}
+    total = sum(wanted.values())
+    if total == 0:
+        return []
+    
+    print(f"🤖 Generating {total} additional questions: {wanted}")
+    questions = _generate(
+        "generate_questions", article_text, lang, deadline,
+        article_title=article_title, wanted=wanted, exclude_questions=exclude_questions or []
+    )
+    
+    return validate_questions(questions, max_questions=total)
+
+
 def validate_quiz_output(result: dict, article_title: str) -> dict:
     """Validate with detailed logging"""
     
@@ -223,10 +502,26 @@ def validate_quiz_output(result: dict, article_title: str) -> dict:
     }
     
     # Validate questions
-    quiz_questions = result.get("quiz", [])
+    validated["quiz"] = validate_questions(result.get("quiz", []))
+    
+    if len(validated["quiz"]) < 7:
+        raise ValueError(f"Only {len(validated['quiz'])} valid questions (minimum 7)")
+    
+    print(f"\nValidation complete:")
+    print(f"  → {len(validated['quiz'])} questions")
+    print(f"  → {len(validated['related_topics'])} related topics")
+    print(f"{'='*70}")
+    
+    return validated
+
+
+def validate_questions(quiz_questions: list, max_questions: int = 10) -> list:
+    """Validate and normalize generated questions, dropping malformed ones"""
+    
     print(f"\nProcessing {len(quiz_questions)} questions...")
+    validated = []
     
-    for idx, q in enumerate(quiz_questions[:10], 1):
+    for idx, q in enumerate(quiz_questions[:max_questions], 1):
         if not isinstance(q, dict):
             continue
         
@@ -259,7 +554,7 @@ def validate_quiz_output(result: dict, article_title: str) -> dict:
         if difficulty not in ["easy", "medium", "hard"]:
             difficulty = "medium"
         
-        validated["quiz"].append({
+        validated.append({
             "question": q["question"].strip(),
             "options": options,
             "answer": answer,
@@ -270,14 +565,6 @@ def validate_quiz_output(result: dict, article_title: str) -> dict:
         
         print(f"  ✓ Q{idx}: Valid")
     
-    if len(validated["quiz"]) < 7:
-        raise ValueError(f"Only {len(validated['quiz'])} valid questions (minimum 7)")
-    
-    print(f"\nValidation complete:")
-    print(f"  → {len(validated['quiz'])} questions")
-    print(f"  → {len(validated['related_topics'])} related topics")
-    print(f"{'='*70}")
-    
     return validated
 
 
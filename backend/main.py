@@ -2,17 +2,44 @@
 backend/main.py - Updated CORS configuration
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-import json
+from typing import Optional
+import asyncio
+import os
+import threading
+import time
 from datetime import datetime
 
-from database import get_db, init_db, Quiz
-from scraper import scrape_wikipedia, preview_wikipedia_url
-from llm_quiz_generator import generate_quiz
+try:
+    # Optional: brotli for clients that accept it, gzip otherwise
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+from database import get_db, get_read_db, init_db, engine, read_engine, Quiz
+from scraper import preview_wikipedia_url
+from quiz_service import (
+    find_cached_quiz, resolve_cached_quiz, find_translated_quizzes, create_quiz, create_variant_quiz,
+    generation_lock
+)
+from llm_quiz_generator import warm_up as warm_up_llm
+from deadline import Deadline, DeadlineExceeded, RequestCancelled
+from shared_state import shared_state, start_purger, WORKER_ID
+from rate_limit import check_rate_limit
+from question_pool import variant_key
+from wiki_lang import parse_wikipedia_url, resolve_article
+from search import init_search_index, search_quizzes
+from prefetch import prefetcher
+from refresh import refresher
+from http_cache import quiz_etag, etag_matches, quiz_cache_headers
+from serialization import loads, quiz_response_bytes, QuizJSONResponse
 from models import (
-    QuizResponse, QuizHistoryItem, URLInput, URLPreviewResponse,
+    QuizResponse, QuizHistoryItem, QuizSearchResult, URLInput, URLPreviewResponse,
     QuizSubmission, QuizScoreResponse
 )
 
@@ -33,15 +60,81 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+
+# Response compression for payloads above the threshold (bytes)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+
+class ActivityMiddleware:
+    """
+    Let the prefetcher know when the API is busy so it only runs when idle
+    Plain ASGI rather than @app.middleware("http"), which hides client
+    disconnects from the endpoints behind it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        prefetcher.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            prefetcher.request_finished()
+
+
+app.add_middleware(ActivityMiddleware)
+
+
+def warm_up_worker():
+    """
+    Open pooled DB connections before traffic arrives
+    The LLM and scraping stack is imported in the background, so /health
+    and read-only endpoints are served while it loads.
+    """
+    for bind in {engine, read_engine}:
+        with bind.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    threading.Thread(target=_load_generation_stack, name="warm-up", daemon=True).start()
+
+
+def _load_generation_stack():
+    started = time.perf_counter()
+    try:
+        import requests, bs4  # noqa: F401
+        warm_up_llm()
+        print(f"✅ Generation stack loaded in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"⚠️  LLM warm-up failed: {e}")
+
+
 # Startup Event
 @app.on_event("startup")
 def startup_event():
-    """Initialize database on startup"""
+    """
+    Initialize database on startup
+    Runs once per worker process: schema setup is serialized through a
+    shared lock (and is a no-op once done), warm-up is per worker.
+    """
     print("\n" + "=" * 60)
-    print("🚀 AI Wiki Quiz Generator API Starting...")
+    print(f"🚀 AI Wiki Quiz Generator API Starting (worker {WORKER_ID})...")
     print("=" * 60)
-    init_db()
+    shared_state.ensure_table()
+    with shared_state.lock("init-db", ttl=120, wait=120):
+        init_db()
+        init_search_index()
+    warm_up_worker()
+    start_purger()
+    prefetcher.start()
+    refresher.start()
     print("✅ Server ready")
     print("🔗 API Docs: http://localhost:8000/docs")
     print("=" * 60 + "\n")
@@ -69,19 +162,29 @@ def health_check():
 
 
 @app.post("/api/preview_url", response_model=URLPreviewResponse)
-def preview_url(input_data: URLInput, db: Session = Depends(get_db)):
+def preview_url(input_data: URLInput, db: Session = Depends(get_read_db)):
     """
     Preview Wikipedia URL before generating quiz
     - Validates URL
     - Fetches title and summary
     - Checks if already cached in database
+    - Lists existing quizzes for the same article in other languages
     """
     try:
         url = input_data.url
+        lang, title = parse_wikipedia_url(url)
         print(f"\n🔍 Preview Request: {url}")
 
         # Check if exists in database
-        existing = db.query(Quiz).filter(Quiz.url == url).first()
+        existing = find_cached_quiz(db, url)
+
+        # Interlanguage links let the client offer an existing translation
+        try:
+            article = resolve_article(lang, title)
+        except Exception as e:
+            print(f"⚠️  Interlanguage lookup failed: {e}")
+            article = None
+        translations = find_translated_quizzes(db, article["langlinks"]) if article else {}
 
         # Get preview from Wikipedia
         preview_data = preview_wikipedia_url(url)
@@ -100,7 +203,9 @@ def preview_url(input_data: URLInput, db: Session = Depends(get_db)):
             exists_in_db=existing is not None,
             cached_quiz_id=existing.id if existing else None,
             image_url=preview_data.get("image_url"),
-            word_count=preview_data.get("word_count")
+            word_count=preview_data.get("word_count"),
+            lang=lang,
+            translations=translations
         )
 
         print(f"✅ Preview: {preview_data['title']} (Cached: {existing is not None})")
@@ -113,72 +218,112 @@ def preview_url(input_data: URLInput, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# How often a running generation checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+async def cancel_on_disconnect(request: Request, deadline: Deadline):
+    """Cancel a request's deadline once its client has disconnected"""
+    while not deadline.cancelled:
+        if await request.is_disconnected():
+            print("🔌 Client disconnected, cancelling generation")
+            deadline.cancel("client disconnected")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
 @app.post("/api/generate_quiz", response_model=QuizResponse)
-def generate_quiz_endpoint(input_data: URLInput, db: Session = Depends(get_db)):
+async def generate_quiz_endpoint(input_data: URLInput, request: Request, db: Session = Depends(get_db)):
     """
     Generate quiz from Wikipedia URL
-    - Checks cache first
+    - Checks cache first (per language, following redirects)
     - Scrapes article
     - Generates quiz with AI
     - Stores in database
     - Returns quiz data
+    - With num_questions/difficulty_mix, samples the article's question
+      pool and only generates the shortfall
+    - Generations are rate limited per client, and concurrent requests for
+      the same article (on any worker) wait for a single generation
+    - Bounded by a per-request deadline (504 when it runs out); work stops
+      early when the client disconnects
     """
+    deadline = Deadline()
+    watcher = asyncio.create_task(cancel_on_disconnect(request, deadline))
+    try:
+        return await run_in_threadpool(_generate_quiz_response, input_data, request, db, deadline)
+    finally:
+        watcher.cancel()
+
+
+def _generate_quiz_response(input_data: URLInput, request: Request, db: Session, deadline: Deadline):
+    """Blocking part of generate_quiz_endpoint (runs in the threadpool)"""
     try:
         url = input_data.url
+        difficulty_counts = input_data.difficulty_counts()
 
         print(f"\n{'=' * 60}")
         print(f"🔍 Quiz Request: {url}")
         print(f"{'=' * 60}")
 
         # Step 1: Check cache
-        existing = db.query(Quiz).filter(Quiz.url == url).first()
-        if existing:
-            print(f"✅ Cache hit (ID: {existing.id})")
-            quiz_data = json.loads(existing.full_quiz_data)
-            return QuizResponse(
-                id=existing.id,
-                url=existing.url,
-                date_generated=existing.date_generated,
-                is_cached=True,
-                **quiz_data
-            )
-
-        # Step 2: Scrape Wikipedia
-        print("🌐 Scraping...")
-        article_text, title, raw_html = scrape_wikipedia(url)
-        print(f"✅ Scraped: {title}")
-
-        # Step 3: Generate quiz with AI
-        print("🤖 Generating quiz...")
-        quiz_data = generate_quiz(article_text, title)
-        print(f"✅ Generated {len(quiz_data['quiz'])} questions")
-
-        # Step 4: Save to database
-        print("💾 Saving...")
-        new_quiz = Quiz(
-            url=url,
-            title=quiz_data["title"],
-            scraped_content=raw_html[:50000],
-            full_quiz_data=json.dumps(quiz_data, ensure_ascii=False)
-        )
-        db.add(new_quiz)
-        db.commit()
-        db.refresh(new_quiz)
-        print(f"✅ Saved (ID: {new_quiz.id})")
-
-        print(f"{'=' * 60}\n")
-
-        # Step 5: Return response
-        return QuizResponse(
-            id=new_quiz.id,
-            url=new_quiz.url,
-            date_generated=new_quiz.date_generated,
-            is_cached=False,
-            **quiz_data
+        existing, canonical_url, article = resolve_cached_quiz(db, url, deadline)
+        is_cached = existing is not None
+
+        if existing is None:
+            # Step 2: Scrape, generate and save (once across workers)
+            check_rate_limit(request)
+            with generation_lock(canonical_url, deadline=deadline) as acquired:
+                if not acquired:
+                    print("⚠️  Generation lock timed out, generating anyway")
+                # Another worker may have stored it while we waited
+                existing = find_cached_quiz(db, canonical_url)
+                is_cached = existing is not None
+                if existing is None:
+                    existing, _, _ = create_quiz(db, canonical_url, deadline=deadline, article=article)
+
+        if difficulty_counts:
+            key = variant_key(difficulty_counts)
+            variant = find_cached_quiz(db, existing.url, key)
+            if variant is None:
+                # Base quiz stored, variant not yet built
+                if is_cached:
+                    check_rate_limit(request)
+                with generation_lock(existing.url, key, deadline=deadline):
+                    variant = find_cached_quiz(db, existing.url, key)
+                    if variant is None:
+                        variant, _ = create_variant_quiz(db, existing, difficulty_counts, deadline)
+                        is_cached = False
+            existing = variant
+
+        quiz_data = loads(existing.full_quiz_data)
+        prefetcher.schedule(url, quiz_data.get("related_topics", []))
+
+        if not is_cached:
+            print(f"{'=' * 60}\n")
+            # Step 3: Return response (stored JSON was validated on write)
+            return QuizJSONResponse(quiz_response_bytes(existing, is_cached=False))
+
+        print(f"✅ Cache hit (ID: {existing.id})")
+        prefetcher.record_hit(existing.id)
+        # Point clients at the cacheable GET representation of this quiz
+        return QuizJSONResponse(
+            quiz_response_bytes(existing, is_cached=True),
+            headers={
+                "ETag": quiz_etag(existing),
+                "Content-Location": f"/api/quiz/{existing.id}"
+            }
         )
 
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        print(f"⏱️  {e}\n")
+        raise HTTPException(status_code=504, detail=str(e))
+    except RequestCancelled as e:
+        # Nobody is listening; 499 is nginx's "client closed request"
+        print(f"⏹️  {e}\n")
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         print(f"❌ Error: {e}\n")
         raise HTTPException(status_code=500, detail=str(e))
@@ -202,7 +347,7 @@ def submit_quiz(submission: QuizSubmission, db: Session = Depends(get_db)):
         if not quiz:
             raise HTTPException(status_code=404, detail="Quiz not found")
 
-        quiz_data = json.loads(quiz.full_quiz_data)
+        quiz_data = loads(quiz.full_quiz_data)
         questions = quiz_data.get("quiz", [])
 
         correct_count = 0
@@ -248,17 +393,26 @@ def submit_quiz(submission: QuizSubmission, db: Session = Depends(get_db)):
 
 
 @app.get("/api/history", response_model=list[QuizHistoryItem])
-def get_history(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get quiz history with question counts"""
+def get_history(
+    skip: int = 0,
+    limit: int = 100,
+    lang: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Get quiz history with question counts, optionally for one language"""
     try:
-        quizzes = db.query(Quiz).order_by(
+        # Variants (custom question mixes) would duplicate their article
+        query = db.query(Quiz).filter(Quiz.superseded_by.is_(None), Quiz.variant.is_(None))
+        if lang:
+            query = query.filter(Quiz.lang == lang)
+        quizzes = query.order_by(
             Quiz.date_generated.desc()
         ).offset(skip).limit(limit).all()
 
         history_items = []
         for quiz in quizzes:
             try:
-                quiz_data = json.loads(quiz.full_quiz_data)
+                quiz_data = loads(quiz.full_quiz_data)
                 q_count = len(quiz_data.get("quiz", []))
             except:
                 q_count = None
@@ -267,6 +421,7 @@ def get_history(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
                 id=quiz.id,
                 url=quiz.url,
                 title=quiz.title,
+                lang=quiz.lang,
                 date_generated=quiz.date_generated,
                 question_count=q_count
             ))
@@ -277,23 +432,61 @@ def get_history(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/search", response_model=list[QuizSearchResult])
+def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    lang: Optional[str] = Query(None, max_length=16),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Search existing quizzes
+    - Matches title, summary, questions, sections and related topics
+    - Optionally restricted to one Wikipedia language
+    - Returns results ranked by relevance with highlighted snippets
+    """
+    try:
+        return search_quizzes(db, q, limit, lang)
+
+    except Exception as e:
+        print(f"❌ Search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/prefetch/stats")
+def prefetch_stats():
+    """Related-topic prefetcher counters, token budget and hit rate"""
+    return prefetcher.stats()
+
+
+@app.get("/api/refresh/stats")
+def refresh_stats():
+    """Revision checks and background refresh counters"""
+    return refresher.stats()
+
+
 @app.get("/api/quiz/{quiz_id}", response_model=QuizResponse)
-def get_quiz_details(quiz_id: int, db: Session = Depends(get_db)):
-    """Get specific quiz details by ID"""
+def get_quiz_details(
+    quiz_id: int,
+    request: Request,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get specific quiz details by ID
+    - Quizzes are immutable, so responses carry an ETag and long Cache-Control
+    - Returns 304 Not Modified when If-None-Match matches
+    """
     try:
         quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
         if not quiz:
             raise HTTPException(status_code=404, detail="Quiz not found")
 
-        quiz_data = json.loads(quiz.full_quiz_data)
+        etag = quiz_etag(quiz)
+        headers = quiz_cache_headers(quiz, etag)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
 
-        return QuizResponse(
-            id=quiz.id,
-            url=quiz.url,
-            date_generated=quiz.date_generated,
-            is_cached=True,
-            **quiz_data
-        )
+        return QuizJSONResponse(quiz_response_bytes(quiz, is_cached=True), headers=headers)
 
     except HTTPException:
         raise
@@ -31,16 +31,21 @@ class KeyEntities(BaseModel):
     locations: List[str] = Field(default_factory=list, description="Locations")
 
 
-class QuizResponse(BaseModel):
-    """Complete quiz response"""
-    id: int
-    url: str
+class QuizPayload(BaseModel):
+    """Generated quiz content as stored in Quiz.full_quiz_data"""
     title: str
     summary: str
     key_entities: KeyEntities
     sections: List[str]
     quiz: List[QuizQuestion]
     related_topics: List[str]
+
+
+class QuizResponse(QuizPayload):
+    """Complete quiz response (stored payload plus envelope fields)"""
+    id: int
+    url: str
+    lang: str = "en"
     date_generated: datetime
     is_cached: bool = False
 
@@ -50,13 +55,35 @@ class QuizHistoryItem(BaseModel):
     id: int
     url: str
     title: str
+    lang: str = "en"
     date_generated: datetime
     question_count: Optional[int] = None
 
 
+class QuizSearchResult(BaseModel):
+    """Full-text search result item"""
+    id: int
+    url: str
+    title: str
+    lang: str = "en"
+    date_generated: datetime
+    snippet: Optional[str] = Field(None, description="Matching excerpt with <mark> highlights")
+    rank: float
+
+
+DIFFICULTIES = ['easy', 'medium', 'hard']
+DEFAULT_QUESTION_COUNT = 10
+DEFAULT_DIFFICULTY_MIX = {'easy': 0.3, 'medium': 0.4, 'hard': 0.3}
+
+
 class URLInput(BaseModel):
-    """URL input validation"""
+    """URL input validation (optionally with quiz size and difficulty mix)"""
     url: str = Field(..., min_length=10, max_length=500)
+    num_questions: Optional[int] = Field(None, ge=3, le=20, description="Number of questions")
+    difficulty_mix: Optional[Dict[str, float]] = Field(
+        None,
+        description="Relative weight per difficulty, e.g. {'easy': 1, 'hard': 1}"
+    )
     
     @validator('url')
     def validate_wikipedia_url(cls, v):
@@ -67,6 +94,37 @@ class URLInput(BaseModel):
         if not v.startswith(("http://", "https://")):
             raise ValueError("URL must start with http:// or https://")
         return v
+    
+    @validator('difficulty_mix')
+    def validate_difficulty_mix(cls, v):
+        """Ensure the mix uses known difficulties with usable weights"""
+        if v is None:
+            return v
+        v = {k.lower(): w for k, w in v.items()}
+        unknown = set(v) - set(DIFFICULTIES)
+        if unknown:
+            raise ValueError(f"Unknown difficulty: {', '.join(sorted(unknown))}")
+        if any(w < 0 for w in v.values()) or sum(v.values()) <= 0:
+            raise ValueError("Difficulty weights must be non-negative and not all zero")
+        return v
+    
+    def difficulty_counts(self) -> Optional[Dict[str, int]]:
+        """
+        Questions wanted per difficulty, or None for the default quiz
+        Weights are apportioned by largest remainder so counts sum exactly
+        """
+        if self.num_questions is None and self.difficulty_mix is None:
+            return None
+        total = self.num_questions or DEFAULT_QUESTION_COUNT
+        mix = self.difficulty_mix or DEFAULT_DIFFICULTY_MIX
+        weight_sum = sum(mix.values())
+        
+        shares = {d: total * mix.get(d, 0) / weight_sum for d in DIFFICULTIES}
+        counts = {d: int(share) for d, share in shares.items()}
+        by_remainder = sorted(DIFFICULTIES, key=lambda d: shares[d] - counts[d], reverse=True)
+        for d in by_remainder[:total - sum(counts.values())]:
+            counts[d] += 1
+        return counts
 
 
 class URLPreviewResponse(BaseModel):
@@ -79,6 +137,11 @@ class URLPreviewResponse(BaseModel):
     cached_quiz_id: Optional[int] = None
     image_url: Optional[str] = None
     word_count: Optional[int] = None
+    lang: str = "en"
+    translations: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Existing quiz ids for this article in other languages"
+    )
 
 
 class QuizSubmission(BaseModel):
@@ -0,0 +1,275 @@
+"""
+Related-topic prefetcher
+Speculatively generates quizzes for the related topics of recently
+requested articles so the next click is usually a cache hit.
+
+Opt-in via PREFETCH_ENABLED=true. Work only runs while the API is idle
+and is capped by an hourly token budget. With several workers, topic
+dedup, the budget, idle detection and hit counts go through shared state.
+"""
+
+from typing import Dict, List, Optional
+import itertools
+import os
+import queue
+import threading
+import time
+
+from database import SessionLocal
+from quiz_service import find_cached_quiz, create_quiz, generation_lock
+from shared_state import shared_state
+from wiki_lang import HEADERS, parse_wikipedia_url, build_article_url
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "3"))
+PREFETCH_MAX_TOKENS_PER_HOUR = int(os.getenv("PREFETCH_MAX_TOKENS_PER_HOUR", "100000"))
+PREFETCH_IDLE_SECONDS = float(os.getenv("PREFETCH_IDLE_SECONDS", "10"))
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "50"))
+
+# Budget estimate for a generation whose size we don't know yet
+ESTIMATED_TOKENS_PER_QUIZ = 6000
+
+# How long prefetch bookkeeping (seen topics, prefetched ids) is kept
+PREFETCH_MEMORY_SECONDS = 7 * 24 * 3600
+# Minimum interval between a worker's shared last-activity writes
+ACTIVITY_WRITE_INTERVAL = 1.0
+
+
+def resolve_topic_url(topic: str, lang: str = "en") -> Optional[str]:
+    """
+    Resolve a free-text related topic to a Wikipedia article URL
+    Uses the OpenSearch API, which follows redirects and fuzzy-matches titles
+
+    Args:
+        topic: Related topic text suggested by the LLM
+        lang: Wikipedia language subdomain
+
+    Returns:
+        str: Article URL, or None if nothing matched
+    """
+    import requests
+
+    try:
+        response = requests.get(
+            f"https://{lang}.wikipedia.org/w/api.php",
+            params={
+                "action": "opensearch",
+                "search": topic,
+                "limit": 1,
+                "namespace": 0,
+                "redirects": "resolve",
+                "format": "json"
+            },
+            headers=HEADERS,
+            timeout=10
+        )
+        response.raise_for_status()
+        titles = response.json()[1]
+        if not titles:
+            return None
+        return build_article_url(lang, titles[0])
+    except Exception as e:
+        print(f"⚠️  Prefetch: could not resolve '{topic}': {e}")
+        return None
+
+
+class Prefetcher:
+    """
+    Background worker that generates quizzes for likely next articles
+    - Topics are queued in relevance order (earlier related topics first)
+    - Work only starts once no API request has been seen for the idle window
+      by any worker
+    - Generation stops for the hour once the (shared) token budget is spent
+    """
+
+    def __init__(self, enabled: bool = PREFETCH_ENABLED, top_k: int = PREFETCH_TOP_K,
+                 max_tokens_per_hour: int = PREFETCH_MAX_TOKENS_PER_HOUR,
+                 idle_seconds: float = PREFETCH_IDLE_SECONDS, state=None):
+        self.enabled = enabled
+        self.top_k = top_k
+        self.max_tokens_per_hour = max_tokens_per_hour
+        self.idle_seconds = idle_seconds
+        self.state = state or shared_state
+
+        self._queue = queue.PriorityQueue(maxsize=PREFETCH_QUEUE_SIZE)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._active_requests = 0
+        self._last_activity = time.time()
+        self._last_activity_written = 0.0
+        self._thread = None
+
+        self._stats = {
+            "scheduled": 0,
+            "already_cached": 0,
+            "unresolved": 0,
+            "failed": 0,
+            "budget_deferred": 0
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    # Lifecycle
+
+    def start(self):
+        """Start the worker thread (no-op when disabled)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="prefetcher", daemon=True)
+        self._thread.start()
+        print(f"✅ Prefetcher running (top {self.top_k}, {self.max_tokens_per_hour} tokens/hour)")
+
+    # Activity tracking (idle-only scheduling)
+
+    def request_started(self):
+        with self._lock:
+            self._active_requests += 1
+            self._last_activity = time.time()
+
+    def request_finished(self):
+        with self._lock:
+            self._active_requests -= 1
+            self._last_activity = now = time.time()
+            publish = now - self._last_activity_written >= ACTIVITY_WRITE_INTERVAL
+            if publish:
+                self._last_activity_written = now
+        if publish and self.enabled:
+            try:
+                self.state.set("prefetch:last-activity", str(now).encode())
+            except Exception as e:
+                print(f"⚠️  Prefetch: could not publish activity: {e}")
+
+    def _is_idle(self) -> bool:
+        with self._lock:
+            if self._active_requests:
+                return False
+            last_activity = self._last_activity
+        shared = self.state.get("prefetch:last-activity")
+        if shared:
+            last_activity = max(last_activity, float(shared))
+        return time.time() - last_activity >= self.idle_seconds
+
+    # Budget (fixed hourly windows shared by all workers)
+
+    @staticmethod
+    def _budget_key() -> str:
+        return f"prefetch:tokens:{int(time.time() // 3600)}"
+
+    def _tokens_last_hour(self) -> int:
+        return self.state.counter(self._budget_key())
+
+    def _record_usage(self, tokens: int):
+        self.state.incr(self._budget_key(), ttl=3600, amount=tokens)
+        self.state.incr("prefetch:tokens-used", ttl=PREFETCH_MEMORY_SECONDS, amount=tokens)
+
+    def _seconds_until_budget(self) -> float:
+        """Seconds until the next hourly window starts"""
+        return max(1.0, 3600 - time.time() % 3600)
+
+    # Scheduling
+
+    def schedule(self, source_url: str, related_topics: List[str]):
+        """
+        Queue the top-K related topics of a quiz for background generation
+
+        Args:
+            source_url: URL of the quiz the topics came from (sets the language)
+            related_topics: Topics in the order returned by the LLM
+        """
+        if not self.enabled:
+            return
+
+        lang, _ = parse_wikipedia_url(source_url)
+        for rank, topic in enumerate(related_topics[:self.top_k]):
+            # Topics are claimed across workers so each is queued only once
+            key = f"prefetch:seen:{lang}:{topic.strip().lower()}"
+            if not self.state.add(key, b"1", ttl=PREFETCH_MEMORY_SECONDS):
+                continue
+            try:
+                self._queue.put_nowait((rank, next(self._counter), lang, topic))
+                self._count("scheduled")
+            except queue.Full:
+                self.state.delete(key)
+                break
+
+    def record_hit(self, quiz_id: int):
+        """Count the first user cache hit on a prefetched quiz"""
+        if not self.enabled or not self.state.get(f"prefetch:quiz:{quiz_id}"):
+            return
+        if self.state.add(f"prefetch:hit:{quiz_id}", b"1", ttl=PREFETCH_MEMORY_SECONDS):
+            self.state.incr("prefetch:hits", ttl=PREFETCH_MEMORY_SECONDS)
+
+    def stats(self) -> Dict:
+        """
+        Counters plus hit rate (share of prefetched quizzes later requested)
+        Queue and per-outcome counters are this worker's; generated, hits
+        and token usage are shared by all workers.
+        """
+        generated = self.state.counter("prefetch:generated")
+        hits = self.state.counter("prefetch:hits")
+        with self._lock:
+            local = dict(self._stats)
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            **local,
+            "generated": generated,
+            "hits": hits,
+            "hit_rate": round(hits / generated, 3) if generated else 0.0,
+            "tokens_used": self.state.counter("prefetch:tokens-used"),
+            "tokens_last_hour": self._tokens_last_hour(),
+            "token_budget_per_hour": self.max_tokens_per_hour
+        }
+
+    # Worker
+
+    def _run(self):
+        while True:
+            rank, seq, lang, topic = self._queue.get()
+            try:
+                # Idle-only: never compete with user requests for the LLM quota
+                while not self._is_idle():
+                    time.sleep(1)
+
+                while self._tokens_last_hour() + ESTIMATED_TOKENS_PER_QUIZ > self.max_tokens_per_hour:
+                    self._count("budget_deferred")
+                    time.sleep(self._seconds_until_budget())
+
+                self._prefetch(lang, topic)
+            except Exception as e:
+                self._count("failed")
+                print(f"⚠️  Prefetch failed for '{topic}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def _prefetch(self, lang: str, topic: str):
+        url = resolve_topic_url(topic, lang)
+        if not url:
+            self._count("unresolved")
+            return
+
+        db = SessionLocal()
+        try:
+            # Skip articles another worker is generating right now
+            with generation_lock(url, wait=0) as acquired:
+                if not acquired or find_cached_quiz(db, url):
+                    self._count("already_cached")
+                    return
+
+                print(f"🔮 Prefetching: {url}")
+                try:
+                    quiz, _, tokens = create_quiz(db, url)
+                except Exception:
+                    # A failed generation may still have spent LLM tokens
+                    self._record_usage(ESTIMATED_TOKENS_PER_QUIZ)
+                    raise
+            self._record_usage(tokens)
+            self.state.set(f"prefetch:quiz:{quiz.id}", b"1", ttl=PREFETCH_MEMORY_SECONDS)
+            self.state.incr("prefetch:generated", ttl=PREFETCH_MEMORY_SECONDS)
+        finally:
+            db.close()
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,118 @@
+"""
+Per-article question pool
+Every validated question generated for an article is kept, so quizzes
+with a custom size or difficulty mix are sampled from the pool and the
+LLM is only asked for the shortfall.
+"""
+
+from sqlalchemy.orm import Session
+from typing import Dict, List, Tuple
+import hashlib
+import random
+import re
+
+from database import PooledQuestion, Quiz, IS_SQLITE
+from serialization import dumps, loads
+
+if IS_SQLITE:
+    from sqlalchemy.dialects.sqlite import insert
+else:
+    from sqlalchemy.dialects.postgresql import insert
+
+MIN_VARIANT_QUESTIONS = 3
+
+
+def question_hash(question_text: str) -> str:
+    """Digest of the normalized question text (case/punctuation-insensitive)"""
+    normalized = re.sub(r"\W+", " ", question_text.lower()).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def variant_key(difficulty_counts: Dict[str, int]) -> str:
+    """Stable cache key for a question count/difficulty mix"""
+    return ";".join(f"{d}={n}" for d, n in sorted(difficulty_counts.items()))
+
+
+def add_to_pool(db: Session, url: str, lang: str, questions: List[dict]) -> int:
+    """
+    Add validated questions to an article's pool, skipping duplicates
+    The caller commits (so pool updates land with the quiz that produced them).
+    Questions another request pooled concurrently are skipped by the
+    unique index instead of failing the commit.
+
+    Returns:
+        int: Number of questions added
+    """
+    rows = {}
+    for q in questions:
+        h = question_hash(q["question"])
+        rows.setdefault(h, {
+            "url": url,
+            "lang": lang,
+            "question_hash": h,
+            "difficulty": q["difficulty"],
+            "question_data": dumps(q).decode("utf-8")
+        })
+    if not rows:
+        return 0
+    stmt = insert(PooledQuestion).values(list(rows.values())).on_conflict_do_nothing(
+        index_elements=["lang", "url", "question_hash"]
+    )
+    return db.execute(stmt).rowcount
+
+
+def clear_pool(db: Session, url: str, lang: str):
+    """Drop an article's pool (e.g. when its quiz is rebuilt from a new revision)"""
+    db.query(PooledQuestion).filter(
+        PooledQuestion.lang == lang, PooledQuestion.url == url
+    ).delete(synchronize_session=False)
+
+
+def get_pool(db: Session, base_quiz: Quiz) -> Dict[str, List[dict]]:
+    """
+    Pooled questions for a quiz's article, grouped by difficulty
+    Seeds the pool from the quiz itself if it predates the pool
+    """
+    rows = db.query(PooledQuestion).filter(
+        PooledQuestion.lang == base_quiz.lang, PooledQuestion.url == base_quiz.url
+    ).all()
+    if not rows:
+        questions = loads(base_quiz.full_quiz_data).get("quiz", [])
+        if add_to_pool(db, base_quiz.url, base_quiz.lang, questions):
+            db.commit()
+        return group_by_difficulty(questions)
+    return group_by_difficulty([loads(row.question_data) for row in rows])
+
+
+def group_by_difficulty(questions: List[dict]) -> Dict[str, List[dict]]:
+    pool = {"easy": [], "medium": [], "hard": []}
+    for q in questions:
+        pool.setdefault(q["difficulty"], []).append(q)
+    return pool
+
+
+def sample_pool(pool: Dict[str, List[dict]],
+                difficulty_counts: Dict[str, int]) -> Tuple[List[dict], Dict[str, int]]:
+    """
+    Sample questions per difficulty from the pool
+
+    Returns:
+        tuple: (sampled questions, shortfall per difficulty)
+    """
+    sampled = []
+    shortfall = {}
+    for difficulty, wanted in difficulty_counts.items():
+        available = pool.get(difficulty, [])
+        take = random.sample(available, min(wanted, len(available)))
+        sampled.extend(take)
+        if wanted > len(take):
+            shortfall[difficulty] = wanted - len(take)
+    return sampled, shortfall
+
+
+def fill_from_other_difficulties(pool: Dict[str, List[dict]], sampled: List[dict],
+                                 missing: int) -> List[dict]:
+    """Top up with unused questions of any difficulty when the LLM came up short"""
+    used = {question_hash(q["question"]) for q in sampled}
+    spare = [q for qs in pool.values() for q in qs if question_hash(q["question"]) not in used]
+    return random.sample(spare, min(missing, len(spare)))
@@ -0,0 +1,418 @@
+"""
+Quiz generation pipeline
+Shared by the API endpoints and background workers (prefetching)
+"""
+
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+import os
+
+from database import Quiz, SessionLocal
+from deadline import Deadline, DeadlineExceeded, RequestCancelled, no_deadline
+from shared_state import shared_state
+from scraper import scrape_wikipedia, extract_revision_id
+from wiki_lang import (
+    parse_wikipedia_url, canonical_wikipedia_url, resolve_article, fetch_revision_info, count_words
+)
+from llm_quiz_generator import generate_quiz, generate_questions, validate_quiz_output, validate_questions
+from extractive_quiz import build_checked_quiz, build_questions, question_problems
+from serialization import serialize_quiz_payload, dumps, loads
+from question_pool import (
+    MIN_VARIANT_QUESTIONS, variant_key, add_to_pool, clear_pool, get_pool,
+    group_by_difficulty, sample_pool, fill_from_other_difficulties
+)
+
+# Rough token accounting: ~4 characters per token, plus the fixed prompt
+CHARS_PER_TOKEN = 4
+PROMPT_OVERHEAD_TOKENS = 600
+MAX_ARTICLE_CHARS = 20000  # Must match the truncation in generate_quiz()
+
+# Articles up to this many words are first tried without the LLM
+# (extractive cloze questions); 0 sends every article to the LLM
+EXTRACTIVE_MAX_WORDS = int(os.getenv("EXTRACTIVE_MAX_WORDS", "600"))
+
+# Cross-worker generation dedup: the lock's TTL (renewed while the holder
+# runs, so it only matters when a worker dies mid-generation), and how long
+# a concurrent request for the same article waits for it
+GENERATION_LOCK_TTL = int(os.getenv("GENERATION_LOCK_TTL", "300"))
+GENERATION_WAIT_SECONDS = float(os.getenv("GENERATION_WAIT_SECONDS", "120"))
+# Redirect resolutions shared by all workers (skips the MediaWiki lookup)
+ALIAS_CACHE_TTL = int(os.getenv("ALIAS_CACHE_TTL", "86400"))
+
+
+def generation_lock(url: str, variant: Optional[str] = None, wait: float = GENERATION_WAIT_SECONDS,
+                    deadline: Optional[Deadline] = None):
+    """
+    Lock held while a quiz for an article (and variant) is generated
+    Yields whether it was acquired; callers re-check the cache once inside,
+    since the previous holder has usually just stored the quiz. Waiting
+    never outlasts the request deadline.
+    """
+    lang, _ = parse_wikipedia_url(url)
+    name = f"generate:{lang}:{canonical_wikipedia_url(url)}"
+    if variant:
+        name += f":{variant}"
+    if deadline is not None:
+        wait = min(wait, deadline.remaining())
+    return shared_state.lock(name, ttl=GENERATION_LOCK_TTL, wait=wait)
+
+
+def find_cached_quiz(db: Session, url: str, variant: Optional[str] = None) -> Optional[Quiz]:
+    """
+    Return the stored quiz for a URL, if one exists
+    Lookups are partitioned by language and match both the canonical
+    form of the URL and the URL exactly as stored before canonicalization.
+    Quizzes replaced by a refreshed version are skipped.
+    """
+    lang, _ = parse_wikipedia_url(url)
+    candidates = {url, canonical_wikipedia_url(url)}
+    variant_filter = Quiz.variant == variant if variant else Quiz.variant.is_(None)
+    return db.query(Quiz).filter(
+        Quiz.lang == lang,
+        Quiz.url.in_(candidates),
+        variant_filter,
+        Quiz.superseded_by.is_(None)
+    ).order_by(Quiz.id.desc()).first()
+
+
+def resolve_cached_quiz(db: Session, url: str, deadline: Optional[Deadline] = None
+                        ) -> Tuple[Optional[Quiz], str, Optional[Dict]]:
+    """
+    Find a stored quiz for a URL, following Wikipedia redirects on a miss
+    Different titles for the same page (redirects, alternate spellings)
+    then share a single quiz instead of each being generated separately.
+
+    Returns:
+        tuple: (stored Quiz or None, canonical URL to store a new quiz under,
+                resolve_article() info when it was looked up, for create_quiz)
+    """
+    canonical_url = canonical_wikipedia_url(url)
+    quiz = find_cached_quiz(db, url)
+    if quiz:
+        return quiz, canonical_url, None
+
+    alias_key = f"alias:{canonical_url}"
+    article = None
+    resolved_url = shared_state.get(alias_key)
+    if resolved_url is not None:
+        resolved_url = resolved_url.decode("utf-8")
+    else:
+        resolved_url = canonical_url
+        try:
+            lang, title = parse_wikipedia_url(url)
+            timeout = (deadline or no_deadline()).timeout(10, "resolving the title")
+            article = resolve_article(lang, title, timeout=timeout)
+            if article:
+                resolved_url = article["url"]
+                shared_state.set(alias_key, resolved_url.encode("utf-8"), ttl=ALIAS_CACHE_TTL)
+        except Exception as e:
+            print(f"⚠️  Could not resolve article title: {e}")
+
+    if resolved_url != canonical_url:
+        return find_cached_quiz(db, resolved_url), resolved_url, article
+    return None, canonical_url, article
+
+
+def find_translated_quizzes(db: Session, langlinks: Dict[str, str]) -> Dict[str, int]:
+    """
+    Map languages to existing quiz ids for an article's interlanguage links
+
+    Args:
+        db: Database session
+        langlinks: {language: article URL} as returned by resolve_article()
+
+    Returns:
+        dict: {language: quiz id} for translations that already have a quiz
+    """
+    if not langlinks:
+        return {}
+    urls = {canonical_wikipedia_url(link) for link in langlinks.values()}
+    rows = db.query(Quiz.lang, Quiz.id).filter(
+        Quiz.url.in_(urls),
+        Quiz.variant.is_(None),
+        Quiz.superseded_by.is_(None)
+    ).all()
+    return {lang: quiz_id for lang, quiz_id in rows if langlinks.get(lang)}
+
+
+def estimate_tokens(article_text: str, quiz_json: str) -> int:
+    """Estimate LLM tokens (prompt + completion) spent on one generation"""
+    chars = min(len(article_text), MAX_ARTICLE_CHARS) + len(quiz_json)
+    return chars // CHARS_PER_TOKEN + PROMPT_OVERHEAD_TOKENS
+
+
+def _is_short_article(article_text: str, lang: str) -> bool:
+    return count_words(article_text, lang) <= EXTRACTIVE_MAX_WORDS
+
+
+def _generate_quiz_data(article_text: str, title: str, lang: str,
+                        deadline: Deadline) -> Tuple[dict, bool]:
+    """
+    Quiz for an article: extractive for short articles when the result
+    passes the quality checks, from the LLM otherwise
+
+    Returns:
+        tuple: (quiz data, whether the LLM was used)
+    """
+    if _is_short_article(article_text, lang):
+        quiz_data, problems = build_checked_quiz(article_text, title, lang)
+        if quiz_data is not None:
+            print(f"⚡ Built extractive quiz ({len(quiz_data['quiz'])} questions, no LLM call)")
+            return quiz_data, False
+        print(f"↪️  Extractive quiz rejected ({'; '.join(problems)}), using the LLM")
+    return generate_quiz(article_text, title, lang=lang, deadline=deadline), True
+
+
+def _generate_extra_questions(article_text: str, title: str, shortfall: Dict[str, int],
+                              existing: List[str], lang: str, deadline: Deadline) -> Tuple[List[dict], bool]:
+    """
+    Questions to cover a variant's shortfall, extractive first for short articles
+
+    Returns:
+        tuple: (questions, whether the LLM was used)
+    """
+    if _is_short_article(article_text, lang):
+        questions = [
+            q for q in build_questions(article_text, title, shortfall, existing, lang)
+            if not question_problems(q)
+        ]
+        if len(questions) >= sum(shortfall.values()):
+            print(f"⚡ Built {len(questions)} extractive questions (no LLM call)")
+            return questions, False
+    return generate_questions(
+        article_text, title, shortfall, exclude_questions=existing, lang=lang, deadline=deadline
+    ), True
+
+
+def _article_size(lang: str, title: str, revision_id: Optional[int],
+                  deadline: Deadline, article: Optional[Dict] = None) -> Optional[int]:
+    """
+    Wikitext size of the scraped revision (None if it has changed since,
+    or if the request has no time left to look it up)
+    Info already fetched by resolve_article() is used when it describes
+    the scraped revision, saving a MediaWiki request.
+    """
+    if article and revision_id and article.get("revision_id") == revision_id:
+        return article.get("length")
+    timeout = min(15, deadline.remaining())
+    if timeout <= 0:
+        return None
+    try:
+        info = fetch_revision_info(lang, [title], timeout=timeout).get(title)
+    except Exception as e:
+        print(f"⚠️  Could not fetch article size: {e}")
+        return None
+    if not info or (revision_id and info["revision_id"] != revision_id):
+        return None
+    return info["length"]
+
+
+def create_quiz(db: Session, url: str, replaces: Optional[Quiz] = None,
+                deadline: Optional[Deadline] = None,
+                article: Optional[Dict] = None) -> Tuple[Quiz, dict, int]:
+    """
+    Scrape an article, generate its quiz and store it
+    The quiz is stored under the canonical URL in the article's language,
+    together with the revision it was built from, and its questions are
+    added to the article's question pool. Short articles skip the LLM when
+    their extractive quiz passes the quality checks.
+
+    Scraping and generation stop as soon as the deadline runs out or is
+    cancelled. A quiz that was already generated is still stored, so the
+    next request for the article is served from the cache.
+
+    Args:
+        db: Database session used to persist the quiz
+        url: Wikipedia article URL
+        replaces: Older quiz for the same article, marked superseded in
+                  the same transaction (it keeps being served until then)
+                  along with its variants; the question pool is rebuilt
+        deadline: Request deadline (none for background jobs)
+        article: resolve_article() info for the page, if already fetched
+
+    Returns:
+        tuple: (stored Quiz row, quiz data dict, estimated LLM tokens used)
+    """
+    deadline = deadline or no_deadline()
+    url = canonical_wikipedia_url(url)
+    lang, _ = parse_wikipedia_url(url)
+
+    # Step 1: Scrape Wikipedia
+    print("🌐 Scraping...")
+    article_text, title, raw_html = scrape_wikipedia(url, deadline)
+    print(f"✅ Scraped: {title}")
+
+    # Step 2: Generate quiz (without AI for short articles when good enough)
+    print("🤖 Generating quiz...")
+    deadline.check("generation")
+    try:
+        quiz_data, used_llm = _generate_quiz_data(article_text, title, lang, deadline)
+    except (DeadlineExceeded, RequestCancelled) as e:
+        if e.late_result is not None:
+            _keep_late_quiz(url, title, raw_html, e.late_result, article)
+        raise
+    print(f"✅ Generated {len(quiz_data['quiz'])} questions")
+
+    # Step 3: Save to database (even if the client has gone, for the cache)
+    if deadline.cancelled:
+        print(f"💾 Request cancelled ({deadline.reason}), keeping the quiz for the cache")
+    new_quiz, quiz_json = _store_quiz(db, url, quiz_data, raw_html, replaces, deadline, article)
+
+    tokens = estimate_tokens(article_text, quiz_json) if used_llm else 0
+    return new_quiz, quiz_data, tokens
+
+
+def _store_quiz(db: Session, url: str, quiz_data: dict, raw_html: str, replaces: Optional[Quiz],
+                deadline: Deadline, article: Optional[Dict] = None) -> Tuple[Quiz, str]:
+    """
+    Persist a generated quiz and add its questions to the pool
+
+    Returns:
+        tuple: (stored Quiz row, serialized quiz JSON)
+    """
+    print("💾 Saving...")
+    lang, page_title = parse_wikipedia_url(url)
+    quiz_json = serialize_quiz_payload(quiz_data)
+    revision_id = extract_revision_id(raw_html)
+    new_quiz = Quiz(
+        url=url,
+        lang=lang,
+        title=quiz_data["title"],
+        scraped_content=raw_html[:50000],
+        full_quiz_data=quiz_json,
+        revision_id=revision_id,
+        revision_size=_article_size(lang, page_title, revision_id, deadline, article)
+    )
+    db.add(new_quiz)
+    if replaces is not None:
+        db.flush()
+        replaces.superseded_by = new_quiz.id
+        db.query(Quiz).filter(
+            Quiz.lang == replaces.lang,
+            Quiz.url == replaces.url,
+            Quiz.variant.isnot(None),
+            Quiz.superseded_by.is_(None)
+        ).update({Quiz.superseded_by: new_quiz.id}, synchronize_session=False)
+        clear_pool(db, replaces.url, replaces.lang)
+    add_to_pool(db, url, lang, quiz_data["quiz"])
+    db.commit()
+    db.refresh(new_quiz)
+    print(f"✅ Saved (ID: {new_quiz.id})")
+    return new_quiz, quiz_json
+
+
+def _keep_late_quiz(url: str, title: str, raw_html: str, late_result, article: Optional[Dict]):
+    """
+    Store a quiz whose LLM answer arrives after its request gave up
+    Skipped if another request has stored (or is generating) the article's
+    quiz by then.
+    """
+    def store(future):
+        try:
+            quiz_data = validate_quiz_output(future.result(), title)
+        except Exception as e:
+            print(f"⚠️  Discarding late quiz for {url}: {e}")
+            return
+        db = SessionLocal()
+        try:
+            with generation_lock(url, wait=0) as acquired:
+                if acquired and find_cached_quiz(db, url) is None:
+                    print(f"💾 Keeping late quiz for {url}")
+                    _store_quiz(db, url, quiz_data, raw_html, None, no_deadline(), article)
+        except Exception as e:
+            print(f"⚠️  Could not store late quiz for {url}: {e}")
+        finally:
+            db.close()
+
+    late_result.add_done_callback(store)
+
+
+def _keep_late_questions(base_quiz: Quiz, wanted: int, late_result):
+    """Add questions whose LLM answer arrives after their request gave up to the pool"""
+    url, lang = base_quiz.url, base_quiz.lang
+
+    def store(future):
+        db = SessionLocal()
+        try:
+            added = add_to_pool(db, url, lang, validate_questions(future.result(), max_questions=wanted))
+            db.commit()
+            print(f"💾 Kept {added} late questions for {url}")
+        except Exception as e:
+            print(f"⚠️  Discarding late questions for {url}: {e}")
+        finally:
+            db.close()
+
+    late_result.add_done_callback(store)
+
+
+def create_variant_quiz(db: Session, base_quiz: Quiz, difficulty_counts: Dict[str, int],
+                        deadline: Optional[Deadline] = None) -> Tuple[Quiz, int]:
+    """
+    Build a quiz with a custom size/difficulty mix from the question pool
+    Only the shortfall the pool can't cover is generated by the LLM; the
+    summary, entities, sections and related topics come from the base quiz.
+    Generated questions are kept in the pool even if the request is
+    cancelled meanwhile.
+
+    Args:
+        db: Database session used to persist the quiz
+        base_quiz: Default quiz for the article
+        difficulty_counts: Number of questions wanted per difficulty
+        deadline: Request deadline bounding scraping and generation
+
+    Returns:
+        tuple: (stored variant Quiz row, estimated tokens used)
+    """
+    pool = get_pool(db, base_quiz)
+    questions, shortfall = sample_pool(pool, difficulty_counts)
+    print(f"🎯 Pool provided {len(questions)} questions, shortfall: {shortfall or 'none'}")
+
+    deadline = deadline or no_deadline()
+    tokens = 0
+    if shortfall:
+        article_text, title, _ = scrape_wikipedia(base_quiz.url, deadline)
+        existing = [q["question"] for qs in pool.values() for q in qs]
+        deadline.check("generation")
+        try:
+            new_questions, used_llm = _generate_extra_questions(
+                article_text, title, shortfall, existing, base_quiz.lang, deadline
+            )
+        except (DeadlineExceeded, RequestCancelled) as e:
+            if e.late_result is not None:
+                _keep_late_questions(base_quiz, sum(shortfall.values()), e.late_result)
+            raise
+        add_to_pool(db, base_quiz.url, base_quiz.lang, new_questions)
+        if used_llm:
+            tokens = estimate_tokens(article_text, dumps(new_questions).decode("utf-8"))
+
+        topped_up, still_short = sample_pool(group_by_difficulty(new_questions), shortfall)
+        questions.extend(topped_up)
+        missing = sum(still_short.values())
+        if missing:
+            pool = group_by_difficulty([q for qs in pool.values() for q in qs] + new_questions)
+            questions.extend(fill_from_other_difficulties(pool, questions, missing))
+
+    if len(questions) < MIN_VARIANT_QUESTIONS:
+        raise ValueError(f"Only {len(questions)} questions available (minimum {MIN_VARIANT_QUESTIONS})")
+
+    order = {"easy": 0, "medium": 1, "hard": 2}
+    questions.sort(key=lambda q: order.get(q["difficulty"], 1))
+
+    quiz_data = loads(base_quiz.full_quiz_data)
+    quiz_data["quiz"] = questions
+
+    variant = Quiz(
+        url=base_quiz.url,
+        lang=base_quiz.lang,
+        title=base_quiz.title,
+        full_quiz_data=serialize_quiz_payload(quiz_data),
+        revision_id=base_quiz.revision_id,
+        revision_size=base_quiz.revision_size,
+        variant=variant_key(difficulty_counts)
+    )
+    db.add(variant)
+    db.commit()
+    db.refresh(variant)
+    print(f"✅ Saved variant {variant.variant} (ID: {variant.id})")
+
+    return variant, tokens
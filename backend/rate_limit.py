@@ -0,0 +1,52 @@
+"""
+Per-client rate limiting for quiz generation
+Counts LLM-backed generations per client in fixed one-minute windows.
+Counters live in shared state, so the limit holds across all workers.
+"""
+
+from fastapi import HTTPException, Request
+import os
+import time
+
+from shared_state import shared_state
+
+# Generations per client per minute (0 disables the limit)
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "10"))
+# Number of reverse proxies in front of the app that append to
+# X-Forwarded-For (1 behind Render's proxy); 0 ignores the header
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+
+def client_id(request: Request, hops: int = TRUSTED_PROXY_HOPS) -> str:
+    """
+    Client address as seen by the outermost trusted proxy
+    Each proxy appends the address it received the request from, so the
+    entry `hops` places from the right is the first one a client can't
+    forge; anything further left is client-supplied.
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded:
+        entries = [entry.strip() for entry in forwarded.split(",") if entry.strip()]
+        if entries:
+            return entries[-min(hops, len(entries))]
+    return request.client.host if request.client else "unknown"
+
+
+def check_rate_limit(request: Request, limit: int = RATE_LIMIT_PER_MINUTE):
+    """
+    Count one generation for the client and reject it over the limit
+
+    Raises:
+        HTTPException: 429 with Retry-After when the window's limit is spent
+    """
+    if limit <= 0:
+        return
+    now = time.time()
+    window = int(now // 60)
+    count = shared_state.incr(f"rate:{client_id(request)}:{window}", ttl=60)
+    if count > limit:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {limit} quiz generations per minute",
+            headers={"Retry-After": str(60 - int(now % 60))}
+        )
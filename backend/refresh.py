@@ -0,0 +1,183 @@
+"""
+Revision-aware quiz refresh
+Periodically checks stored quizzes against the current Wikipedia revision
+and regenerates the ones whose article changed substantially.
+
+Opt-in via REFRESH_ENABLED=true. Checks are batched (50 articles per API
+call) and regeneration only runs inside the off-peak window. Cached quizzes
+keep being served until their replacement is stored (stale-while-revalidate).
+With several workers, only one of them runs the check in each interval.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, time as dt_time
+from typing import Dict, List, Tuple
+import os
+import threading
+import time
+
+from database import SessionLocal, Quiz
+from quiz_service import create_quiz
+from shared_state import shared_state
+from wiki_lang import parse_wikipedia_url, fetch_revision_info
+
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "false").lower() == "true"
+REFRESH_WINDOW_UTC = os.getenv("REFRESH_WINDOW_UTC", "02:00-06:00")
+REFRESH_INTERVAL_SECONDS = int(os.getenv("REFRESH_INTERVAL_SECONDS", "1800"))
+REFRESH_MIN_AGE_HOURS = int(os.getenv("REFRESH_MIN_AGE_HOURS", "24"))
+REFRESH_MIN_CHANGE_RATIO = float(os.getenv("REFRESH_MIN_CHANGE_RATIO", "0.10"))
+REFRESH_MIN_CHANGE_BYTES = int(os.getenv("REFRESH_MIN_CHANGE_BYTES", "2000"))
+REFRESH_MAX_PER_RUN = int(os.getenv("REFRESH_MAX_PER_RUN", "20"))
+REFRESH_CHECK_LIMIT = int(os.getenv("REFRESH_CHECK_LIMIT", "1000"))
+
+
+def parse_window(window: str) -> Tuple[dt_time, dt_time]:
+    """Parse an 'HH:MM-HH:MM' window (may wrap past midnight)"""
+    start, end = window.split("-")
+    return (datetime.strptime(start.strip(), "%H:%M").time(),
+            datetime.strptime(end.strip(), "%H:%M").time())
+
+
+def in_window(now: dt_time, window: Tuple[dt_time, dt_time]) -> bool:
+    """True if a time of day falls inside the window"""
+    start, end = window
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+
+def is_substantial_change(old_size: int, new_size: int) -> bool:
+    """
+    Decide whether an article changed enough to regenerate its quiz
+    Size delta is a cheap proxy for the content diff: it's returned by the
+    batched info query, so no per-article diff has to be fetched.
+    """
+    delta = abs(new_size - old_size)
+    return delta >= max(REFRESH_MIN_CHANGE_BYTES, REFRESH_MIN_CHANGE_RATIO * old_size)
+
+
+class Refresher:
+    """
+    Background worker that keeps cached quizzes in step with Wikipedia
+    - Revision checks: one API request per 50 articles, per language
+    - Quizzes without a recorded revision just get their baseline stored
+    - Regeneration is capped per run and limited to the off-peak window
+    """
+
+    def __init__(self, enabled: bool = REFRESH_ENABLED, window: str = REFRESH_WINDOW_UTC):
+        self.enabled = enabled
+        self.window_label = window
+        self.window = parse_window(window)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "checked": 0,
+            "baselined": 0,
+            "unchanged": 0,
+            "minor_changes": 0,
+            "refreshed": 0,
+            "failed": 0,
+            "last_run": None
+        }
+
+    def start(self):
+        """Start the worker thread (no-op when disabled)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="refresher", daemon=True)
+        self._thread.start()
+        print(f"✅ Refresher running (window {self.window_label} UTC)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"enabled": self.enabled, "window_utc": self.window_label, **self._stats}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        while True:
+            if in_window(datetime.utcnow().time(), self.window):
+                try:
+                    # One run per interval across all workers
+                    if shared_state.add("refresh-run", b"1", ttl=REFRESH_INTERVAL_SECONDS * 0.9):
+                        self.run_once()
+                except Exception as e:
+                    print(f"⚠️  Refresh run failed: {e}")
+            time.sleep(REFRESH_INTERVAL_SECONDS)
+
+    def run_once(self) -> List[int]:
+        """
+        Check current quizzes and regenerate substantially changed ones
+
+        Returns:
+            list: Ids of the newly generated quizzes
+        """
+        db = SessionLocal()
+        refreshed = []
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=REFRESH_MIN_AGE_HOURS)
+            quizzes = db.query(Quiz).filter(
+                Quiz.superseded_by.is_(None),
+                Quiz.variant.is_(None),
+                Quiz.date_generated < cutoff
+            ).order_by(Quiz.date_generated.asc()).limit(REFRESH_CHECK_LIMIT).all()
+
+            stale = self._find_stale(db, quizzes)
+
+            for quiz in stale[:REFRESH_MAX_PER_RUN]:
+                if not in_window(datetime.utcnow().time(), self.window):
+                    break
+                try:
+                    print(f"🔄 Refreshing quiz {quiz.id}: {quiz.url}")
+                    new_quiz, _, _ = create_quiz(db, quiz.url, replaces=quiz)
+                    refreshed.append(new_quiz.id)
+                    self._count("refreshed")
+                except Exception as e:
+                    db.rollback()
+                    self._count("failed")
+                    print(f"⚠️  Refresh failed for quiz {quiz.id}: {e}")
+
+            with self._lock:
+                self._stats["runs"] += 1
+                self._stats["last_run"] = datetime.utcnow().isoformat()
+            return refreshed
+        finally:
+            db.close()
+
+    def _find_stale(self, db, quizzes: List[Quiz]) -> List[Quiz]:
+        """Batch-check revisions; record baselines and return changed quizzes"""
+        by_lang = defaultdict(list)
+        for quiz in quizzes:
+            by_lang[quiz.lang].append(quiz)
+
+        stale = []
+        for lang, lang_quizzes in by_lang.items():
+            titles = {quiz.id: parse_wikipedia_url(quiz.url)[1] for quiz in lang_quizzes}
+            current = fetch_revision_info(lang, sorted(set(titles.values())))
+            self._count("checked", len(lang_quizzes))
+
+            for quiz in lang_quizzes:
+                info = current.get(titles[quiz.id])
+                if not info:
+                    continue
+                if quiz.revision_id is None or quiz.revision_size is None:
+                    # Stored before revision tracking: adopt the current
+                    # revision as the baseline rather than regenerating
+                    quiz.revision_id = info["revision_id"]
+                    quiz.revision_size = info["length"]
+                    self._count("baselined")
+                elif info["revision_id"] == quiz.revision_id:
+                    self._count("unchanged")
+                elif is_substantial_change(quiz.revision_size, info["length"]):
+                    stale.append(quiz)
+                else:
+                    self._count("minor_changes")
+
+        db.commit()
+        return stale
+
+
+refresher = Refresher()
@@ -3,10 +3,17 @@ Wikipedia scraper with preview functionality
 Fetches and cleans Wikipedia article content
 """
 
-import requests
-from bs4 import BeautifulSoup
 import re
-from typing import Tuple, Dict
+import time
+from typing import Tuple, Dict, Optional
+
+from wiki_lang import parse_wikipedia_url, get_language_rules
+from deadline import Deadline, DeadlineExceeded, RequestCancelled, no_deadline
+
+MAX_WORDS = 5000
+MAX_CHARS_UNSPACED = 15000  # Limit for scripts without word spacing (ja, zh)
+FETCH_TIMEOUT_SECONDS = 15  # Whole download; capped further by the request deadline
+FETCH_CHUNK_BYTES = 64 * 1024
 
 
 def preview_wikipedia_url(url: str) -> Dict:
@@ -20,6 +27,10 @@ def preview_wikipedia_url(url: str) -> Dict:
     Returns:
         dict: Preview information
     """
+    # Imported on first use to keep API startup fast
+    import requests
+    from bs4 import BeautifulSoup
+
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
@@ -76,26 +87,77 @@ def preview_wikipedia_url(url: str) -> Dict:
         }
 
 
-def scrape_wikipedia(url: str) -> Tuple[str, str, str]:
+def _download(url: str, headers: Dict, deadline: Deadline) -> Tuple[bytes, str]:
+    """
+    Fetch a page within FETCH_TIMEOUT_SECONDS and the request deadline
+    A requests timeout only bounds each socket operation, so a slowly
+    trickled body could run on indefinitely. The connection and headers
+    get a total time limit; the body is read in chunks with the socket
+    timeout set to the time left before each read.
+
+    Returns:
+        tuple: (body bytes, body decoded as text)
+    """
+    import requests
+    from urllib3.util import Timeout
+
+    budget = deadline.timeout(FETCH_TIMEOUT_SECONDS, "scraping")
+    give_up_at = time.monotonic() + budget
+    response = requests.get(url, headers=headers, timeout=Timeout(total=budget), stream=True)
+    try:
+        response.raise_for_status()
+        raw = response.raw
+        sock = getattr(getattr(raw, "connection", None), "sock", None)
+        # read1 returns what has arrived instead of waiting for a full chunk
+        read = getattr(raw, "read1", raw.read)
+        chunks = []
+        while True:
+            left = give_up_at - time.monotonic()
+            if left <= 0 or deadline.cancelled:
+                deadline.check("scraping")
+                raise TimeoutError(f"Download took longer than {budget:.0f}s")
+            if sock is not None:
+                sock.settimeout(left)
+            chunk = read(FETCH_CHUNK_BYTES, decode_content=True)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        response.close()
+
+    content = b"".join(chunks)
+    return content, content.decode(response.encoding or "utf-8", errors="replace")
+
+
+def scrape_wikipedia(url: str, deadline: Optional[Deadline] = None) -> Tuple[str, str, str]:
     """
     Scrape Wikipedia article and return cleaned content
+    Cleanup and length limits follow the article language's rules
     
     Args:
         url: Wikipedia article URL
+        deadline: Request deadline; the fetch gets at most the time left
         
     Returns:
         tuple: (cleaned_text, article_title, raw_html)
     """
+    # Imported on first use to keep API startup fast
+    from bs4 import BeautifulSoup
+
+    deadline = deadline or no_deadline()
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         
-        print(f"  → Fetching: {url}")
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        lang, _ = parse_wikipedia_url(url)
+        rules = get_language_rules(lang)
+
+        print(f"  → Fetching: {url} ({lang})")
+        content, raw_html = _download(url, headers, deadline)
+        deadline.check("parsing")
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = BeautifulSoup(content, 'html.parser')
         
         # Extract title
         title_elem = soup.find('h1', {'id': 'firstHeading'})
@@ -128,26 +190,46 @@ def scrape_wikipedia(url: str) -> Tuple[str, str, str]:
         
         # Clean up text
         cleaned_text = re.sub(r'\[\d+\]', '', cleaned_text)  # Remove citations
-        cleaned_text = re.sub(r'\[citation needed\]', '', cleaned_text)
+        for pattern in rules["inline_notes"]:
+            cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.IGNORECASE)
         cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()  # Normalize whitespace
         
         # Limit text length for efficiency
-        words = cleaned_text.split()
-        if len(words) > 5000:
-            cleaned_text = ' '.join(words[:5000])
-            print(f"  → Truncated to 5000 words")
-        
-        print(f"  → Extracted {len(words)} words")
+        if rules["spaced"]:
+            words = cleaned_text.split()
+            if len(words) > MAX_WORDS:
+                cleaned_text = ' '.join(words[:MAX_WORDS])
+                print(f"  → Truncated to {MAX_WORDS} words")
+            print(f"  → Extracted {len(words)} words")
+        else:
+            if len(cleaned_text) > MAX_CHARS_UNSPACED:
+                print(f"  → Truncated to {MAX_CHARS_UNSPACED} characters")
+            cleaned_text = cleaned_text[:MAX_CHARS_UNSPACED]
+            print(f"  → Extracted {len(cleaned_text)} characters")
         
         if len(cleaned_text) < 200:
             raise ValueError("Content too short (less than 200 characters)")
         
-        return cleaned_text, title, response.text
+        return cleaned_text, title, raw_html
         
+    except (DeadlineExceeded, RequestCancelled):
+        raise
     except Exception as e:
+        # A fetch cut short by the deadline is reported as such
+        deadline.check("scraping")
         raise Exception(f"Scraping error: {str(e)}")
 
 
+def extract_revision_id(raw_html: str) -> Optional[int]:
+    """
+    Revision id of a scraped article page
+    MediaWiki embeds it in the page config (wgRevisionId), so it always
+    matches the content that was actually scraped.
+    """
+    match = re.search(r'"wgRevisionId"\s*:\s*(\d+)', raw_html)
+    return int(match.group(1)) if match else None
+
+
 if __name__ == "__main__":
     # Test scraper
     test_url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
@@ -0,0 +1,315 @@
+"""
+Full-text search over generated quizzes
+Maintains an FTS5 index (SQLite) or a tsvector table (PostgreSQL)
+that is kept in sync with the quizzes table on every write.
+Documents carry their Wikipedia language so searches can be partitioned
+and PostgreSQL can stem each document with its own text search config.
+"""
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+import html
+import json
+import re
+
+from database import engine, IS_SQLITE, Quiz
+from wiki_lang import DEFAULT_LANG, LANGUAGE_RULES, FALLBACK_RULES, get_language_rules
+
+SEARCH_TABLE = "quiz_search"
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+# The database marks matches with these private-use characters; they are
+# swapped for the tags only after the snippet text has been HTML-escaped
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+# Column weights: title > summary > sections/topics > question text
+SQLITE_BM25_WEIGHTS = "10.0, 5.0, 1.0, 2.0, 2.0"
+
+# Every PostgreSQL text search config a document can be indexed with
+_TS_CONFIGS = sorted({rules["ts_config"] for rules in LANGUAGE_RULES.values()} | {FALLBACK_RULES["ts_config"]})
+
+# Set by init_search_index(); False means the LIKE fallback is used
+_fts_available = False
+
+
+def build_search_document(full_quiz_data: str) -> Dict[str, str]:
+    """
+    Flatten stored quiz JSON into the searchable text columns
+
+    Args:
+        full_quiz_data: JSON string as stored in Quiz.full_quiz_data
+
+    Returns:
+        dict: title, summary, questions, sections and related_topics text
+    """
+    try:
+        data = json.loads(full_quiz_data)
+    except (TypeError, ValueError):
+        data = {}
+
+    questions = []
+    for q in data.get("quiz", []):
+        questions.append(q.get("question", ""))
+        questions.extend(q.get("options", []))
+        questions.append(q.get("explanation", ""))
+
+    return {
+        "title": data.get("title", ""),
+        "summary": data.get("summary", ""),
+        "questions": " ".join(questions),
+        "sections": " ".join(data.get("sections", [])),
+        "related_topics": " ".join(data.get("related_topics", []))
+    }
+
+
+def index_quiz(connection, quiz_id: int, full_quiz_data: str, lang: str = DEFAULT_LANG):
+    """
+    Insert or replace the search document for a quiz
+    Runs on the caller's connection so it commits atomically with the quiz row
+    """
+    if not _fts_available:
+        return
+
+    doc = build_search_document(full_quiz_data)
+    doc["quiz_id"] = quiz_id
+    doc["lang"] = lang
+    doc["config"] = get_language_rules(lang)["ts_config"]
+    doc["topics"] = f"{doc['sections']} {doc['related_topics']}"
+
+    if IS_SQLITE:
+        connection.execute(
+            text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :quiz_id"),
+            {"quiz_id": quiz_id}
+        )
+        connection.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE} (rowid, title, summary, questions, sections, related_topics, lang)
+            VALUES (:quiz_id, :title, :summary, :questions, :sections, :related_topics, :lang)
+        """), doc)
+    else:
+        connection.execute(text(f"""
+            INSERT INTO {SEARCH_TABLE} (quiz_id, title, summary, questions, sections, related_topics,
+                                        lang, config, document)
+            VALUES (:quiz_id, :title, :summary, :questions, :sections, :related_topics,
+                    :lang, CAST(:config AS regconfig),
+                    setweight(to_tsvector(CAST(:config AS regconfig), :title), 'A') ||
+                    setweight(to_tsvector(CAST(:config AS regconfig), :summary), 'B') ||
+                    setweight(to_tsvector(CAST(:config AS regconfig), :topics), 'C') ||
+                    setweight(to_tsvector(CAST(:config AS regconfig), :questions), 'D'))
+            ON CONFLICT (quiz_id) DO UPDATE SET
+                title = EXCLUDED.title,
+                summary = EXCLUDED.summary,
+                questions = EXCLUDED.questions,
+                sections = EXCLUDED.sections,
+                related_topics = EXCLUDED.related_topics,
+                lang = EXCLUDED.lang,
+                config = EXCLUDED.config,
+                document = EXCLUDED.document
+        """), doc)
+
+
+@event.listens_for(Quiz, "after_insert")
+@event.listens_for(Quiz, "after_update")
+def _sync_search_index(mapper, connection, target):
+    """Keep the search index in sync with quiz writes"""
+    index_quiz(connection, target.id, target.full_quiz_data, target.lang or DEFAULT_LANG)
+
+
+def init_search_index():
+    """
+    Create the search index if needed and backfill quizzes missing from it
+    Falls back to LIKE matching when the SQLite build lacks FTS5
+    """
+    global _fts_available
+
+    try:
+        with engine.begin() as conn:
+            if IS_SQLITE:
+                # FTS5 tables can't be altered; rebuild indexes created before
+                # the lang column existed (the backfill below repopulates them)
+                columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({SEARCH_TABLE})"))}
+                if columns and "lang" not in columns:
+                    conn.execute(text(f"DROP TABLE {SEARCH_TABLE}"))
+                conn.execute(text(f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+                        title, summary, questions, sections, related_topics,
+                        lang UNINDEXED,
+                        tokenize = 'unicode61 remove_diacritics 2'
+                    )
+                """))
+                missing = conn.execute(text(f"""
+                    SELECT id, full_quiz_data, lang FROM quizzes
+                    WHERE id NOT IN (SELECT rowid FROM {SEARCH_TABLE})
+                """)).fetchall()
+            else:
+                conn.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} (
+                        quiz_id INTEGER PRIMARY KEY REFERENCES quizzes(id) ON DELETE CASCADE,
+                        title TEXT, summary TEXT, questions TEXT,
+                        sections TEXT, related_topics TEXT,
+                        document TSVECTOR NOT NULL
+                    )
+                """))
+                conn.execute(text(
+                    f"ALTER TABLE {SEARCH_TABLE} ADD COLUMN IF NOT EXISTS lang TEXT NOT NULL DEFAULT 'en'"
+                ))
+                conn.execute(text(
+                    f"ALTER TABLE {SEARCH_TABLE} ADD COLUMN IF NOT EXISTS config REGCONFIG NOT NULL DEFAULT 'english'"
+                ))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_document "
+                    f"ON {SEARCH_TABLE} USING GIN (document)"
+                ))
+                missing = conn.execute(text(f"""
+                    SELECT id, full_quiz_data, lang FROM quizzes
+                    WHERE id NOT IN (SELECT quiz_id FROM {SEARCH_TABLE})
+                """)).fetchall()
+
+            _fts_available = True
+            for quiz_id, full_quiz_data, lang in missing:
+                index_quiz(conn, quiz_id, full_quiz_data, lang)
+
+        print(f"✅ Search index ready ({len(missing)} quizzes backfilled)")
+    except Exception as e:
+        _fts_available = False
+        print(f"⚠️  Full-text search unavailable, using LIKE fallback: {e}")
+
+
+def _to_fts5_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression
+    Each term is quoted (so FTS5 operators in user input are inert);
+    the last term is a prefix match for search-as-you-type.
+    """
+    terms = re.findall(r"\w+", query, re.UNICODE)
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _snippet_html(snippet: Optional[str]) -> Optional[str]:
+    """HTML-escape a snippet, then turn the match markers into <mark> tags"""
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet)
+    return escaped.replace(_MATCH_START, SNIPPET_START).replace(_MATCH_END, SNIPPET_END)
+
+
+def search_quizzes(db: Session, query: str, limit: int = 20,
+                   lang: Optional[str] = None) -> List[Dict]:
+    """
+    Search quizzes by title, summary, questions, sections and related topics
+
+    Args:
+        db: Database session
+        query: Free-text search query
+        limit: Maximum number of results
+        lang: Restrict results to one Wikipedia language
+
+    Returns:
+        list: Results with id, url, title, date_generated, snippet and rank
+              (higher rank = more relevant); snippets are HTML-escaped
+              text with matches wrapped in <mark>
+    """
+    if not _fts_available:
+        return _search_like(db, query, limit, lang)
+
+    if IS_SQLITE:
+        match = _to_fts5_query(query)
+        if not match:
+            return []
+        rows = db.execute(text(f"""
+            SELECT q.id, q.url, q.title, q.lang, q.date_generated,
+                   snippet({SEARCH_TABLE}, -1, :start, :end, '…', 16) AS snippet,
+                   -bm25({SEARCH_TABLE}, {SQLITE_BM25_WEIGHTS}) AS rank
+            FROM {SEARCH_TABLE}
+            JOIN quizzes q ON q.id = {SEARCH_TABLE}.rowid
+            WHERE {SEARCH_TABLE} MATCH :match
+              AND q.superseded_by IS NULL AND q.variant IS NULL
+              AND (:lang IS NULL OR {SEARCH_TABLE}.lang = :lang)
+            ORDER BY rank DESC
+            LIMIT :limit
+        """), {
+            "match": match,
+            "lang": lang,
+            "start": _MATCH_START,
+            "end": _MATCH_END,
+            "limit": limit
+        })
+    else:
+        rows = db.execute(text(_postgres_search_sql(lang)), {
+            "query": query,
+            "lang": lang,
+            "options": f"StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords=30, MinWords=10",
+            "limit": limit
+        })
+
+    results = [dict(row._mapping) for row in rows]
+    for result in results:
+        result["snippet"] = _snippet_html(result["snippet"])
+    return results
+
+
+def _postgres_search_sql(lang: Optional[str]) -> str:
+    """
+    Ranked PostgreSQL search over documents of one or all languages
+    Documents are stemmed with their own config, so the query is parsed
+    once per config, each branch matching only documents indexed with it.
+    The configs are literals from LANGUAGE_RULES, which gives the planner a
+    constant tsquery per branch that the GIN index can serve. Snippets are
+    only built for the rows that make the limit.
+    """
+    configs = [get_language_rules(lang)["ts_config"]] if lang else _TS_CONFIGS
+    lang_filter = "AND s.lang = :lang" if lang else ""
+    branches = []
+    for config in configs:
+        tsquery = f"websearch_to_tsquery(CAST('{config}' AS regconfig), :query)"
+        branches.append(f"""
+            SELECT s.quiz_id, {tsquery} AS query, ts_rank_cd(s.document, {tsquery}) AS rank
+            FROM {SEARCH_TABLE} s
+            JOIN quizzes q ON q.id = s.quiz_id
+            WHERE s.document @@ {tsquery}
+              AND s.config = CAST('{config}' AS regconfig)
+              AND q.superseded_by IS NULL AND q.variant IS NULL
+              {lang_filter}
+        """)
+    return f"""
+        SELECT q.id, q.url, q.title, q.lang, q.date_generated,
+               ts_headline(s.config, s.summary || ' ' || s.questions, hits.query, :options) AS snippet,
+               hits.rank
+        FROM ({" UNION ALL ".join(branches)}
+            ORDER BY rank DESC
+            LIMIT :limit
+        ) AS hits
+        JOIN {SEARCH_TABLE} s ON s.quiz_id = hits.quiz_id
+        JOIN quizzes q ON q.id = hits.quiz_id
+        ORDER BY hits.rank DESC
+    """
+
+
+def _search_like(db: Session, query: str, limit: int, lang: Optional[str] = None) -> List[Dict]:
+    """Unranked substring search used when no full-text index is available"""
+    # Wildcards in the query match literally
+    escaped = re.sub(r"([\\%_])", r"\\\1", query.strip())
+    pattern = f"%{escaped}%"
+    results = db.query(Quiz).filter(
+        Quiz.title.ilike(pattern, escape="\\") | Quiz.full_quiz_data.ilike(pattern, escape="\\"),
+        Quiz.superseded_by.is_(None),
+        Quiz.variant.is_(None)
+    )
+    if lang:
+        results = results.filter(Quiz.lang == lang)
+    quizzes = results.order_by(Quiz.date_generated.desc()).limit(limit).all()
+
+    return [{
+        "id": quiz.id,
+        "url": quiz.url,
+        "title": quiz.title,
+        "lang": quiz.lang,
+        "date_generated": quiz.date_generated,
+        "snippet": None,
+        "rank": 0.0
+    } for quiz in quizzes]
@@ -0,0 +1,73 @@
+"""
+Fast JSON serialization for quiz payloads
+Quiz JSON is validated once and stored in canonical form at write time,
+so reads can splice the envelope fields (id, url, date...) onto the
+stored bytes instead of parsing, re-validating and re-encoding them.
+"""
+
+from fastapi import Response
+from typing import Any
+import json
+
+from database import Quiz
+from models import QuizPayload
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON encoding (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data) -> Any:
+    """Parse JSON from str or bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def serialize_quiz_payload(quiz_data: dict) -> str:
+    """
+    Validate generated quiz data and return its canonical stored form
+    Only QuizPayload fields are kept, so envelope keys can never collide
+    with the ones spliced in by quiz_response_bytes().
+    """
+    payload = QuizPayload(**quiz_data)
+    return dumps(payload.model_dump(mode="json")).decode("utf-8")
+
+
+def quiz_response_bytes(quiz: Quiz, is_cached: bool) -> bytes:
+    """
+    Build a QuizResponse JSON body from a stored quiz without re-validation
+
+    Args:
+        quiz: Stored quiz row (full_quiz_data is a JSON object we wrote)
+        is_cached: Value of the is_cached envelope field
+
+    Returns:
+        bytes: JSON equivalent to QuizResponse(...).model_dump_json()
+    """
+    stored = quiz.full_quiz_data.strip()
+    if not stored.startswith("{") or stored == "{}":
+        raise ValueError(f"Stored quiz {quiz.id} is not a JSON object")
+
+    envelope = dumps({
+        "id": quiz.id,
+        "url": quiz.url,
+        "lang": quiz.lang,
+        "date_generated": quiz.date_generated.isoformat(),
+        "is_cached": is_cached
+    })
+    # '{"id":...,"is_cached":true' + ',' + '"title":...}'
+    return envelope[:-1] + b"," + stored[1:].encode("utf-8")
+
+
+class QuizJSONResponse(Response):
+    """Response for pre-serialized quiz JSON"""
+    media_type = "application/json"
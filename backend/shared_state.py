@@ -0,0 +1,301 @@
+"""
+Shared state for multi-worker deployments
+Cache entries, counters and locks that every worker process sees.
+
+Backends:
+- Database (default): a shared_state table in the application database,
+  safe across processes with SQLite WAL or PostgreSQL
+- Redis: used when REDIS_URL is set and the redis package is installed
+  (any Redis-compatible server works, e.g. a local Valkey/KeyDB)
+"""
+
+from contextlib import contextmanager
+from typing import Optional
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import case, delete, inspect, select, update, or_
+from sqlalchemy.exc import IntegrityError
+
+from database import engine, IS_SQLITE, SharedStateEntry
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Identifies this process as a lock owner
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class SharedState:
+    """
+    Interface for cross-worker state
+    Values are bytes; every key may carry a TTL in seconds
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set a key only if it doesn't exist (or has expired); True if set"""
+        raise NotImplementedError
+
+    def incr(self, key: str, ttl: float, amount: int = 1) -> int:
+        """Increment a counter; the TTL starts when the counter is created"""
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        """Current value of a counter (0 if missing or expired)"""
+        raise NotImplementedError
+
+    def acquire_lock(self, name: str, ttl: float, owner: str = WORKER_ID) -> bool:
+        """Try once to take a lock; expired locks are taken over"""
+        return self.add(f"lock:{name}", owner.encode(), ttl)
+
+    def renew_lock(self, name: str, ttl: float, owner: str = WORKER_ID) -> bool:
+        """Extend a lock held by owner; False if it was lost"""
+        raise NotImplementedError
+
+    def release_lock(self, name: str, owner: str = WORKER_ID):
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, name: str, ttl: float = 60, wait: float = 0, poll: float = 0.5):
+        """
+        Hold a lock for the duration of a block
+        Waits up to `wait` seconds to acquire it and yields whether it was
+        acquired, so callers can decide to proceed without it on timeout.
+        The owner is unique per call, so threads in one worker exclude
+        each other too. While the block runs the lock is renewed every
+        third of its TTL, so long holders keep it; the TTL only frees
+        locks of workers that died.
+        """
+        owner = f"{WORKER_ID}-{uuid.uuid4().hex[:8]}"
+        deadline = time.monotonic() + wait
+        acquired = self.acquire_lock(name, ttl, owner)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(poll)
+            acquired = self.acquire_lock(name, ttl, owner)
+        released = threading.Event()
+        if acquired:
+            threading.Thread(
+                target=self._keep_lock, args=(name, ttl, owner, released),
+                name=f"lock-renewer:{name}", daemon=True
+            ).start()
+        try:
+            yield acquired
+        finally:
+            released.set()
+            if acquired:
+                self.release_lock(name, owner)
+
+    def _keep_lock(self, name: str, ttl: float, owner: str, released: threading.Event):
+        """Renew a held lock until it's released (or found lost)"""
+        while not released.wait(ttl / 3):
+            try:
+                if not self.renew_lock(name, ttl, owner):
+                    print(f"⚠️  Lock {name} was lost before it was released")
+                    return
+            except Exception as e:
+                print(f"⚠️  Could not renew lock {name}: {e}")
+
+
+class DatabaseState(SharedState):
+    """Shared state stored in the application database"""
+
+    def __init__(self, bind=engine):
+        self.engine = bind
+        if IS_SQLITE:
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        self._insert = insert
+
+    def ensure_table(self):
+        """Create the table if missing (tolerates other workers racing us)"""
+        try:
+            SharedStateEntry.__table__.create(self.engine, checkfirst=True)
+        except Exception:
+            if not inspect(self.engine).has_table(SharedStateEntry.__tablename__):
+                raise
+
+    @staticmethod
+    def _live(now: float):
+        return or_(SharedStateEntry.expires_at.is_(None), SharedStateEntry.expires_at > now)
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(SharedStateEntry.value).where(
+                    SharedStateEntry.key == key, self._live(time.time())
+                )
+            ).scalar()
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        stmt = self._insert(SharedStateEntry).values(
+            key=key, value=value, counter=0, expires_at=self._expiry(ttl)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SharedStateEntry.key],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def delete(self, key: str):
+        with self.engine.begin() as conn:
+            conn.execute(delete(SharedStateEntry).where(SharedStateEntry.key == key))
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(delete(SharedStateEntry).where(
+                    SharedStateEntry.key == key, SharedStateEntry.expires_at <= time.time()
+                ))
+                conn.execute(self._insert(SharedStateEntry).values(
+                    key=key, value=value, counter=0, expires_at=self._expiry(ttl)
+                ))
+            return True
+        except IntegrityError:
+            return False
+
+    def incr(self, key: str, ttl: float, amount: int = 1) -> int:
+        now = time.time()
+        stmt = self._insert(SharedStateEntry).values(key=key, counter=amount, expires_at=now + ttl)
+        expired = SharedStateEntry.expires_at <= now
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SharedStateEntry.key],
+            set_={
+                "counter": case((expired, amount), else_=SharedStateEntry.counter + amount),
+                "expires_at": case((expired, now + ttl), else_=SharedStateEntry.expires_at)
+            }
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+            return conn.execute(
+                select(SharedStateEntry.counter).where(SharedStateEntry.key == key)
+            ).scalar()
+
+    def counter(self, key: str) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(SharedStateEntry.counter).where(
+                    SharedStateEntry.key == key, self._live(time.time())
+                )
+            ).scalar() or 0
+
+    def renew_lock(self, name: str, ttl: float, owner: str = WORKER_ID) -> bool:
+        with self.engine.begin() as conn:
+            result = conn.execute(update(SharedStateEntry).where(
+                SharedStateEntry.key == f"lock:{name}",
+                SharedStateEntry.value == owner.encode()
+            ).values(expires_at=time.time() + ttl))
+            return result.rowcount == 1
+
+    def release_lock(self, name: str, owner: str = WORKER_ID):
+        with self.engine.begin() as conn:
+            conn.execute(delete(SharedStateEntry).where(
+                SharedStateEntry.key == f"lock:{name}",
+                SharedStateEntry.value == owner.encode()
+            ))
+
+    def purge_expired(self):
+        """Remove expired entries (called periodically by the leader)"""
+        with self.engine.begin() as conn:
+            conn.execute(delete(SharedStateEntry).where(SharedStateEntry.expires_at <= time.time()))
+
+
+class RedisState(SharedState):
+    """Shared state stored in Redis (or any Redis-compatible server)"""
+
+    # Delete/extend a lock only if it's still ours
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+    _RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url)
+        self._release = self.client.register_script(self._RELEASE)
+        self._renew = self.client.register_script(self._RENEW)
+
+    def ensure_table(self):
+        self.client.ping()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(key, value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def incr(self, key: str, ttl: float, amount: int = 1) -> int:
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        pipe.pexpire(key, int(ttl * 1000), nx=True)
+        return pipe.execute()[0]
+
+    def counter(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def renew_lock(self, name: str, ttl: float, owner: str = WORKER_ID) -> bool:
+        return bool(self._renew(keys=[f"lock:{name}"], args=[owner, int(ttl * 1000)]))
+
+    def release_lock(self, name: str, owner: str = WORKER_ID):
+        self._release(keys=[f"lock:{name}"], args=[owner])
+
+    def purge_expired(self):
+        pass  # Redis expires keys itself
+
+
+def _create_shared_state() -> SharedState:
+    if REDIS_URL:
+        if redis is None:
+            print("⚠️  REDIS_URL is set but the redis package is not installed; using the database")
+        else:
+            return RedisState(REDIS_URL)
+    return DatabaseState()
+
+
+shared_state = _create_shared_state()
+
+
+PURGE_INTERVAL_SECONDS = 300
+
+
+def start_purger(state: SharedState = None, interval: float = PURGE_INTERVAL_SECONDS):
+    """
+    Periodically drop expired entries
+    Every worker runs the thread; the `add` guard lets only one of them
+    purge per interval.
+    """
+    state = state or shared_state
+
+    def run():
+        while True:
+            try:
+                if state.add("purge-expired", WORKER_ID.encode(), ttl=interval):
+                    state.purge_expired()
+            except Exception as e:
+                print(f"⚠️  Shared state purge failed: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="shared-state-purger", daemon=True).start()
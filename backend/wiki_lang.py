@@ -0,0 +1,259 @@
+"""
+Wikipedia language handling
+URL parsing and canonicalization, per-language extraction rules and
+interlanguage link lookup via the MediaWiki API
+"""
+
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, unquote, quote
+import re
+
+DEFAULT_LANG = "en"
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# Per-language extraction rules
+# - inline_notes: inline maintenance markers left in paragraph text
+# - spaced: False for scripts without word spacing (limits use characters)
+# - ts_config: PostgreSQL text search configuration
+LANGUAGE_RULES = {
+    "en": {
+        "name": "English",
+        "inline_notes": [r"\[citation needed\]", r"\[clarification needed\]",
+                         r"\[when\?\]", r"\[who\?\]", r"\[according to whom\?\]"],
+        "spaced": True,
+        "ts_config": "english"
+    },
+    "de": {
+        "name": "German",
+        "inline_notes": [r"\[Anm\.\s*\d+\]", r"\[Quelle fehlt\]"],
+        "spaced": True,
+        "ts_config": "german"
+    },
+    "fr": {
+        "name": "French",
+        "inline_notes": [r"\[réf\.\s*nécessaire\]", r"\[réf\.\s*souhaitée\]", r"\[Quand \?\]"],
+        "spaced": True,
+        "ts_config": "french"
+    },
+    "es": {
+        "name": "Spanish",
+        "inline_notes": [r"\[cita requerida\]", r"\[nota\s*\d+\]"],
+        "spaced": True,
+        "ts_config": "spanish"
+    },
+    "it": {
+        "name": "Italian",
+        "inline_notes": [r"\[senza fonte\]", r"\[N\s*\d+\]"],
+        "spaced": True,
+        "ts_config": "italian"
+    },
+    "pt": {
+        "name": "Portuguese",
+        "inline_notes": [r"\[carece de fontes\?\]", r"\[nota\s*\d+\]"],
+        "spaced": True,
+        "ts_config": "portuguese"
+    },
+    "nl": {
+        "name": "Dutch",
+        "inline_notes": [r"\[bron\?\]"],
+        "spaced": True,
+        "ts_config": "dutch"
+    },
+    "ru": {
+        "name": "Russian",
+        "inline_notes": [r"\[источник не указан[^\]]*\]", r"\[прим\.\s*\d+\]"],
+        "spaced": True,
+        "ts_config": "russian"
+    },
+    "ja": {
+        "name": "Japanese",
+        "inline_notes": [r"\[要出典\]", r"\[注\s*\d+\]"],
+        "spaced": False,
+        "ts_config": "simple"
+    },
+    "zh": {
+        "name": "Chinese",
+        "inline_notes": [r"\[来源请求\]", r"\[來源請求\]", r"\[注\s*\d+\]"],
+        "spaced": False,
+        "ts_config": "simple"
+    }
+}
+
+# Used for languages without dedicated rules
+FALLBACK_RULES = {
+    "name": None,
+    "inline_notes": [],
+    "spaced": True,
+    "ts_config": "simple"
+}
+
+# Any subdomain label of wikipedia.org names a wiki: "en", "simple",
+# "be-tarask", "zh-min-nan"... except these, which aren't languages
+_LANG_RE = re.compile(r"^[a-z0-9]+(-[a-z0-9]+)*$")
+_NON_LANG_SUBDOMAINS = {"www", "m"}
+
+
+def get_language_rules(lang: str) -> Dict:
+    """Extraction rules for a language, falling back to generic rules"""
+    rules = LANGUAGE_RULES.get(lang)
+    if rules:
+        return rules
+    return {**FALLBACK_RULES, "name": f"the article's language ({lang})"}
+
+
+# Characters per word for scripts without word spacing (the scraper's
+# 5000 word and 15000 character limits use the same ratio)
+CHARS_PER_WORD_UNSPACED = 3
+
+
+def count_words(text: str, lang: str) -> int:
+    """Word count, estimated from characters for scripts without word spacing"""
+    if get_language_rules(lang)["spaced"]:
+        return len(text.split())
+    return len(text) // CHARS_PER_WORD_UNSPACED
+
+
+def parse_wikipedia_url(url: str) -> Tuple[str, str]:
+    """
+    Split a Wikipedia article URL into language and title
+
+    Args:
+        url: Article URL (desktop or mobile, any language)
+
+    Returns:
+        tuple: (language code, decoded title with spaces)
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    parts = host.split(".")
+
+    lang = DEFAULT_LANG
+    if host.endswith(".wikipedia.org") and len(parts) >= 3:
+        if _LANG_RE.match(parts[0]) and parts[0] not in _NON_LANG_SUBDOMAINS:
+            lang = parts[0]
+
+    title = unquote(parsed.path.split("/wiki/", 1)[-1]).replace("_", " ").strip()
+    return lang, title
+
+
+def build_article_url(lang: str, title: str) -> str:
+    """Canonical desktop URL for an article title"""
+    return f"https://{lang}.wikipedia.org/wiki/{quote(title.replace(' ', '_'), safe='()_,:/')}"
+
+
+def canonical_wikipedia_url(url: str) -> str:
+    """
+    Normalize a Wikipedia URL so equivalent URLs share one cache entry
+    Drops mobile subdomains, query strings and fragments, and normalizes
+    title encoding and capitalization of the first letter.
+    """
+    lang, title = parse_wikipedia_url(url)
+    if title:
+        title = title[0].upper() + title[1:]
+    return build_article_url(lang, title)
+
+
+def resolve_article(lang: str, title: str, timeout: float = 10) -> Optional[Dict]:
+    """
+    Resolve redirects and fetch interlanguage links for an article
+    A single MediaWiki API call; returns None if the page doesn't exist
+
+    Returns:
+        dict: title (canonical), url, revision_id, length (bytes of wikitext)
+              and langlinks {lang: url}
+    """
+    import requests
+
+    response = requests.get(
+        f"https://{lang}.wikipedia.org/w/api.php",
+        params={
+            "action": "query",
+            "titles": title,
+            "redirects": 1,
+            "prop": "info|langlinks",
+            "llprop": "url",
+            "lllimit": "max",
+            "format": "json",
+            "formatversion": 2
+        },
+        headers=HEADERS,
+        timeout=timeout
+    )
+    response.raise_for_status()
+    pages = response.json().get("query", {}).get("pages", [])
+    if not pages or pages[0].get("missing"):
+        return None
+
+    page = pages[0]
+    return {
+        "title": page["title"],
+        "url": build_article_url(lang, page["title"]),
+        "revision_id": page.get("lastrevid"),
+        "length": page.get("length"),
+        "langlinks": {
+            link["lang"]: link.get("url") or build_article_url(link["lang"], link["title"])
+            for link in page.get("langlinks", [])
+        }
+    }
+
+
+# MediaWiki allows up to 50 titles per query for normal clients
+MAX_TITLES_PER_QUERY = 50
+
+
+def fetch_revision_info(lang: str, titles: List[str], timeout: float = 15) -> Dict[str, Dict]:
+    """
+    Batch-fetch the current revision id and size of many articles
+    One API request per 50 titles; redirects and title normalization are
+    followed and mapped back to the requested titles.
+
+    Args:
+        lang: Wikipedia language of all titles
+        titles: Article titles as requested
+
+    Returns:
+        dict: {requested title: {"revision_id": int, "length": int}}
+              (missing pages are omitted)
+    """
+    import requests
+
+    info = {}
+    for start in range(0, len(titles), MAX_TITLES_PER_QUERY):
+        batch = titles[start:start + MAX_TITLES_PER_QUERY]
+        response = requests.get(
+            f"https://{lang}.wikipedia.org/w/api.php",
+            params={
+                "action": "query",
+                "titles": "|".join(batch),
+                "redirects": 1,
+                "prop": "info",
+                "format": "json",
+                "formatversion": 2
+            },
+            headers=HEADERS,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        query = response.json().get("query", {})
+
+        # requested title -> final title, through normalization and redirects
+        renames = {}
+        for step in query.get("normalized", []) + query.get("redirects", []):
+            renames[step["from"]] = step["to"]
+
+        pages = {
+            page["title"]: {"revision_id": page.get("lastrevid"), "length": page.get("length")}
+            for page in query.get("pages", []) if not page.get("missing")
+        }
+
+        for title in batch:
+            final = title
+            for _ in range(3):  # normalized -> redirect -> normalized at most
+                final = renames.get(final, final)
+            if final in pages:
+                info[title] = pages[final]
+
+    return info
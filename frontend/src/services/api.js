@@ -4,13 +4,14 @@ const API_BASE_URL = import.meta.env.PROD
   : 'http://localhost:8000/api';
 /**
  * Generate a quiz from a Wikipedia URL
+ * Optional: { num_questions, difficulty_mix: { easy, medium, hard } }
  */
-export const generateQuiz = async (url) => {
+export const generateQuiz = async (url, options = {}) => {
   try {
     const response = await fetch(`${API_BASE_URL}/generate_quiz`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ url }),
+      body: JSON.stringify({ url, ...options }),
     });
     
     if (!response.ok) {
@@ -63,6 +64,24 @@ export const getQuizHistory = async () => {
   }
 };
 
+/**
+ * Search existing quizzes by keyword
+ */
+export const searchQuizzes = async (query, limit = 20) => {
+  try {
+    const params = new URLSearchParams({ q: query, limit });
+    const response = await fetch(`${API_BASE_URL}/search?${params}`);
+    
+    if (!response.ok) {
+      throw new Error('Search failed');
+    }
+    
+    return await response.json();
+  } catch (error) {
+    throw new Error(error.message || 'Network error occurred');
+  }
+};
+
 /**
  * Fetch specific quiz details by ID
  */